@@ -27,6 +27,12 @@ export async function POST(request: NextRequest) {
       headers: {
         "Content-Type": "application/json",
         "X-Request-ID": request.headers.get("x-request-id") || Math.random().toString(36),
+        ...(request.headers.get("if-none-match")
+          ? { "If-None-Match": request.headers.get("if-none-match") as string }
+          : {}),
+        ...(request.headers.get("x-render-priority")
+          ? { "X-Render-Priority": request.headers.get("x-render-priority") as string }
+          : {}),
       },
       body: JSON.stringify({ 
         resume_data, 
@@ -34,8 +40,21 @@ export async function POST(request: NextRequest) {
         page_size: "A4",
         margin: "0.5in"
       }),
+      // Abort when the visitor goes away, so the service drops the queued render
+      signal: request.signal,
     });
 
+    const etag = response.headers.get("etag");
+    const cacheHeaders: Record<string, string> = {
+      "Cache-Control": response.headers.get("cache-control") || "no-store, max-age=0",
+      ...(etag ? { ETag: etag } : {}),
+    };
+
+    // The client already has this PDF
+    if (response.status === 304) {
+      return new NextResponse(null, { status: 304, headers: cacheHeaders });
+    }
+
     if (!response.ok) {
       throw new Error(`PDF service responded with ${response.status}`);
     }
@@ -47,7 +66,7 @@ export async function POST(request: NextRequest) {
       headers: {
         "Content-Type": "application/pdf",
         "Content-Disposition": `attachment; filename="${encodeURIComponent(filename)}"`,
-        "Cache-Control": "no-store, max-age=0",
+        ...cacheHeaders,
       },
       status: 200,
     });
@@ -106,8 +125,14 @@ export async function GET(request: NextRequest) {
           filename: "Robel-Fekadu-Resume.pdf"
         }),
         headers: {
-          "Content-Type": "application/json"
-        }
+          "Content-Type": "application/json",
+          ...(request.headers.get("if-none-match")
+            ? { "If-None-Match": request.headers.get("if-none-match") as string }
+            : {}),
+          // Version previews from the admin page queue behind visitor downloads
+          ...(versionId ? { "X-Render-Priority": "preview" } : {}),
+        },
+        signal: request.signal,
       }
     ));
     
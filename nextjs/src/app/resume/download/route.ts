@@ -1,7 +1,7 @@
-import { NextResponse } from "next/server";
+import { NextRequest, NextResponse } from "next/server";
 import { getResumeHTML } from "@/lib/resume-server";
 
-export async function GET() {
+export async function GET(request: NextRequest) {
   try {
     const html = await getResumeHTML();
     
@@ -10,10 +10,24 @@ export async function GET() {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
+        ...(request.headers.get("if-none-match")
+          ? { "If-None-Match": request.headers.get("if-none-match") as string }
+          : {}),
       },
       body: JSON.stringify({ html, filename: "Robel-Fekadu-Resume.pdf" }),
     });
 
+    const etag = response.headers.get("etag");
+    const cacheHeaders: Record<string, string> = {
+      "Cache-Control": response.headers.get("cache-control") || "no-store, max-age=0",
+      ...(etag ? { ETag: etag } : {}),
+    };
+
+    // The client already has this PDF
+    if (response.status === 304) {
+      return new NextResponse(null, { status: 304, headers: cacheHeaders });
+    }
+
     if (!response.ok) {
       throw new Error(`PDF service responded with ${response.status}`);
     }
@@ -24,7 +38,7 @@ export async function GET() {
       headers: {
         "Content-Type": "application/pdf",
         "Content-Disposition": 'attachment; filename="Robel-Fekadu-Resume.pdf"',
-        "Cache-Control": "no-store, max-age=0",
+        ...cacheHeaders,
       },
     });
   } catch (error: any) {
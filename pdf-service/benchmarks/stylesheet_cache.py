@@ -0,0 +1,79 @@
+"""
+Before/after benchmark for the per-worker stylesheet and font cache.
+
+Renders the same resume in-process, first the way every render used to run
+(fresh FontConfiguration and freshly parsed CSS each time), then through
+_generate_pdf_sync with the worker's cached FontConfiguration and parsed
+stylesheets. Both paths use the worker's URL fetcher and the print quality
+profile, so only the caching differs. Reports wall and CPU time per render
+for both.
+
+    python benchmarks/stylesheet_cache.py --renders 50 --jobs 10
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from weasyprint import CSS, HTML
+from weasyprint.text.fonts import FontConfiguration
+from services import pdf_generator
+from services.resume_template import render_resume
+from benchmarks.synthetic import sample_resume
+
+def render_uncached(html: str, stylesheet: str) -> None:
+    profile = pdf_generator.QUALITY_PROFILES["print"]
+    fetcher = {"url_fetcher": pdf_generator._url_fetcher, "base_url": pdf_generator._base_url}
+    font_config = FontConfiguration()
+    css = CSS(string=stylesheet, font_config=font_config, **fetcher)
+    document = HTML(string=html, **fetcher).render(
+        stylesheets=[css], font_config=font_config, **profile.render_options
+    )
+    document.write_pdf(**profile.write_options)
+
+def render_cached(html: str, stylesheet: str) -> None:
+    pdf_generator._generate_pdf_sync(html, (stylesheet,), quality="print")
+
+def measure(render, html: str, stylesheet: str, renders: int) -> dict:
+    render(html, stylesheet)  # warm-up
+    wall, cpu = [], []
+    for _ in range(renders):
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        render(html, stylesheet)
+        wall.append(time.perf_counter() - wall_start)
+        cpu.append(time.process_time() - cpu_start)
+    return {
+        "wall_ms_median": round(statistics.median(wall) * 1000, 2),
+        "wall_ms_mean": round(statistics.mean(wall) * 1000, 2),
+        "cpu_ms_mean": round(statistics.mean(cpu) * 1000, 2),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--renders", type=int, default=30)
+    parser.add_argument("--jobs", type=int, default=10, help="Work entries in the sample resume")
+    parser.add_argument("--theme", default="classic")
+    args = parser.parse_args()
+
+    resume = render_resume(sample_resume(args.jobs), args.theme)
+    stylesheet = resume.stylesheets[0]
+
+    pdf_generator._init_worker()
+    before = measure(render_uncached, resume.html, stylesheet, args.renders)
+    after = measure(render_cached, resume.html, stylesheet, args.renders)
+
+    print(json.dumps({
+        "renders": args.renders,
+        "jobs": args.jobs,
+        "theme": args.theme,
+        "before": before,
+        "after": after,
+        "cpu_saved_pct": round(100 * (1 - after["cpu_ms_mean"] / before["cpu_ms_mean"]), 1),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
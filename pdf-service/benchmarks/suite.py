@@ -0,0 +1,302 @@
+"""
+Load and latency benchmark suite for the PDF service.
+
+Drives /api/resume-pdf with synthetic resumes (1 to 40 jobs) and /api/pdf
+with HTML documents of increasing size, in-process through the ASGI app
+with Redis replaced by fakeredis. Each workload runs two phases:
+
+    cold  sequential requests for distinct documents, so every one renders
+    load  concurrent requests drawn from a small set of documents, so the
+          cache and single-flight paths are exercised as in production
+
+Reports p50/p95/p99 latency, renders per second per core, peak RSS
+of the API process and render workers, cache outcomes and mean stage times,
+and writes everything as JSON. Pass --baseline to compare with an earlier run.
+
+    python benchmarks/suite.py --output results.json
+    python benchmarks/suite.py --quick --baseline results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx
+from fakeredis.aioredis import FakeRedis
+from benchmarks.synthetic import sample_html, sample_resume
+
+RESUME_JOBS = (1, 5, 10, 20, 40)
+HTML_SIZES_KB = (5, 50, 200, 450)
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if len(samples) < 2:
+        value = round(samples[0] * 1000, 2) if samples else 0.0
+        return {"p50_ms": value, "p95_ms": value, "p99_ms": value}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "p50_ms": round(cuts[49] * 1000, 2),
+        "p95_ms": round(cuts[94] * 1000, 2),
+        "p99_ms": round(cuts[98] * 1000, 2),
+    }
+
+class Workload:
+    """A family of same-sized documents sent to one endpoint"""
+
+    def __init__(self, name: str, endpoint: str, make):
+        self.name = name
+        self.endpoint = endpoint
+        self.make = make
+
+    def body(self, variant: int) -> Dict[str, Any]:
+        return self.make(variant)
+
+def workloads(quick: bool) -> List[Workload]:
+    jobs = RESUME_JOBS[::2] if quick else RESUME_JOBS
+    sizes = HTML_SIZES_KB[::2] if quick else HTML_SIZES_KB
+    result = [
+        Workload(f"resume-{n}-jobs", "/api/resume-pdf", lambda v, n=n: {"resume_data": sample_resume(n, v)})
+        for n in jobs
+    ]
+    result += [
+        Workload(f"html-{kb}kb", "/api/pdf", lambda v, kb=kb: {"html": sample_html(kb, v)})
+        for kb in sizes
+    ]
+    return result
+
+class Probe:
+    """Tracks peak worker RSS while a phase runs and diffs counters around it"""
+
+    def __init__(self, pdf_generator, cache, metrics):
+        self.pdf_generator = pdf_generator
+        self.cache = cache
+        self.metrics = metrics
+        self.peak_worker_rss_mb = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def _counters(self) -> Dict[str, Any]:
+        pool = self.pdf_generator._pool
+        return {
+            "renders": pool.stats()["completed"] if pool is not None else 0,
+            "l1_hits": self.cache._l1.hits,
+            "l1_misses": self.cache._l1.misses,
+            "l2_hits": self.cache._l2_stats["hits"],
+            "l2_misses": self.cache._l2_stats["misses"],
+            "stages": {
+                stage: (sum(h.counts), h.sum) for stage, h in self.metrics._stages.items()
+            },
+        }
+
+    async def _watch(self) -> None:
+        while True:
+            pool = self.pdf_generator._pool
+            if pool is not None:
+                for worker in pool._workers:
+                    self.peak_worker_rss_mb = max(self.peak_worker_rss_mb, worker.rss_mb)
+            await asyncio.sleep(0.05)
+
+    def start(self) -> None:
+        self.before = self._counters()
+        self.peak_worker_rss_mb = 0.0
+        self._task = asyncio.create_task(self._watch())
+
+    async def stop(self) -> Dict[str, Any]:
+        self._task.cancel()
+        after = self._counters()
+        stages = {}
+        for stage, (count, total) in after["stages"].items():
+            count_before, total_before = self.before["stages"][stage]
+            if count > count_before:
+                stages[stage] = round((total - total_before) / (count - count_before) * 1000, 3)
+        l1 = (after["l1_hits"] - self.before["l1_hits"], after["l1_misses"] - self.before["l1_misses"])
+        l2 = (after["l2_hits"] - self.before["l2_hits"], after["l2_misses"] - self.before["l2_misses"])
+        return {
+            "renders": after["renders"] - self.before["renders"],
+            "l1_hit_ratio": round(l1[0] / sum(l1), 3) if sum(l1) else None,
+            "l2_hit_ratio": round(l2[0] / sum(l2), 3) if sum(l2) else None,
+            "stage_mean_ms": stages,
+            "peak_worker_rss_mb": round(self.peak_worker_rss_mb, 1),
+        }
+
+async def run_phase(client, probe: Probe, workload: Workload, variants: List[int], concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    outcomes: Counter = Counter()
+    queue: asyncio.Queue = asyncio.Queue()
+    for variant in variants:
+        queue.put_nowait(variant)
+
+    async def client_loop() -> None:
+        while not queue.empty():
+            body = workload.body(queue.get_nowait())
+            start = time.perf_counter()
+            response = await client.post(workload.endpoint, json=body)
+            latencies.append(time.perf_counter() - start)
+            outcomes[response.headers.get("x-cache", f"HTTP {response.status_code}")] += 1
+
+    probe.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    facts = await probe.stop()
+
+    from config import settings
+    return {
+        "requests": len(variants),
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(len(variants) / elapsed, 2),
+        # Workers beyond the core count only time-slice, so divide by whichever is fewer
+        "renders_per_s_per_core": round(
+            facts["renders"] / elapsed / min(settings.render_workers, os.cpu_count() or 1), 3
+        ),
+        "latency": {**percentiles(latencies), "mean_ms": round(statistics.mean(latencies) * 1000, 2)},
+        "cache": {
+            "outcomes": dict(outcomes),
+            "hit_ratio": round(outcomes["HIT"] / len(variants), 3),
+            "l1_hit_ratio": facts["l1_hit_ratio"],
+            "l2_hit_ratio": facts["l2_hit_ratio"],
+        },
+        "renders": facts["renders"],
+        "stage_mean_ms": facts["stage_mean_ms"],
+        "peak_worker_rss_mb": facts["peak_worker_rss_mb"],
+    }
+
+def environment() -> Dict[str, Any]:
+    from config import settings
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    try:
+        from importlib import metadata
+        weasyprint_version = metadata.version("weasyprint")
+    except Exception:
+        weasyprint_version = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "render_workers": settings.render_workers,
+        "weasyprint": weasyprint_version,
+    }
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """Percentage change of the headline numbers against a baseline run"""
+    def change(new, old):
+        return round(100 * (new - old) / old, 1) if old else None
+
+    report = {}
+    for name, phases in results["workloads"].items():
+        old_phases = baseline.get("workloads", {}).get(name)
+        if not old_phases:
+            continue
+        for phase, new in phases.items():
+            old = old_phases.get(phase)
+            if not old:
+                continue
+            report[f"{name}/{phase}"] = {
+                "p50_pct": change(new["latency"]["p50_ms"], old["latency"]["p50_ms"]),
+                "p95_pct": change(new["latency"]["p95_ms"], old["latency"]["p95_ms"]),
+                "p99_pct": change(new["latency"]["p99_ms"], old["latency"]["p99_ms"]),
+                "requests_per_s_pct": change(new["requests_per_s"], old["requests_per_s"]),
+            }
+    return report
+
+async def check_l2(cache) -> None:
+    """
+    Make sure reads that miss L1 are served from the Redis fake
+
+    A Redis command the fake cannot serve is logged and counted as a miss,
+    which would leave every L2 figure in the results silently empty.
+    """
+    key = "benchmark:l2-check"
+    hits = cache._l2_stats["hits"]
+    await cache.cache_pdf(key, b"%PDF-1.7 l2 check")
+    if key in cache._l1._entries:
+        cache._l1._remove(key)
+    if await cache.get_cached_entry(key) is None or cache._l2_stats["hits"] == hits:
+        raise RuntimeError(f"Redis fake served no L2 hit (L2 stats: {cache._l2_stats})")
+
+async def run(args) -> Dict[str, Any]:
+    import main as service
+    from services import cache, metrics, pdf_generator, redis_client
+
+    redis_client._redis = FakeRedis()
+    if args.no_l1:
+        # Values larger than the bound are never stored, so every hit comes from Redis
+        cache._l1.max_bytes = 0
+    await check_l2(cache)
+    rng = random.Random(args.seed)
+    probe = Probe(pdf_generator, cache, metrics)
+    results: Dict[str, Any] = {"environment": environment(), "settings": vars(args), "workloads": {}}
+
+    transport = httpx.ASGITransport(app=service.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://localhost", timeout=None) as client:
+        # Spawn and warm the render workers outside the measurements
+        await pdf_generator.check_renderer()
+
+        for index, workload in enumerate(workloads(args.quick)):
+            # Variants are offset per workload so no document is shared between them
+            base = index * 1_000_000
+            cold = [base + i for i in range(args.cold)]
+            hot_set = [base + 500_000 + i for i in range(args.distinct)]
+            load = [rng.choice(hot_set) for _ in range(args.requests)]
+
+            results["workloads"][workload.name] = {
+                "cold": await run_phase(client, probe, workload, cold, 1),
+                "load": await run_phase(client, probe, workload, load, args.concurrency),
+            }
+            summary = results["workloads"][workload.name]
+            print(
+                f"{workload.name:>16}: cold p50 {summary['cold']['latency']['p50_ms']:>8} ms, "
+                f"load p95 {summary['load']['latency']['p95_ms']:>8} ms, "
+                f"{summary['load']['requests_per_s']:>7} req/s",
+                file=sys.stderr,
+            )
+
+    results["l2"] = dict(cache._l2_stats)
+    results["peak_api_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    pdf_generator.shutdown_render_pool()
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cold", type=int, default=10, help="Sequential distinct renders per workload")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per workload under load")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--distinct", type=int, default=10, help="Distinct documents in the load phase")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-l1", action="store_true", help="Disable the in-process cache to measure the Redis tier")
+    parser.add_argument("--quick", action="store_true", help="Run every other workload size")
+    parser.add_argument("--output", help="Write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.baseline:
+        results["comparison"] = compare(results, json.loads(Path(args.baseline).read_text()))
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Deterministic synthetic documents for the benchmarks.
+
+The same arguments always produce the same document, so runs on different
+commits render identical input.
+"""
+from typing import Any, Dict
+
+def sample_resume(jobs: int, variant: int = 0) -> Dict[str, Any]:
+    """
+    A JSON Resume with the given number of work entries
+
+    Args:
+        jobs: Work entries; 1 fits on a page, 40 runs to several
+        variant: Changes the name only, giving a distinct cache key
+    """
+    return {
+        "basics": {
+            "name": f"Sample Person {variant}",
+            "label": "Software Engineer",
+            "email": "sample@example.com",
+            "location": "Remote",
+            "profiles": [{"network": "GitHub", "url": "https://github.com/example"}],
+        },
+        "summary": "Engineer with a long track record of shipping things. " * 4,
+        "work": [
+            {
+                "name": f"Company {i}",
+                "position": "Senior Engineer",
+                "startDate": "2019",
+                "endDate": "2021",
+                "highlights": [f"Delivered project {i}.{j} on time and under budget" for j in range(5)],
+            }
+            for i in range(jobs)
+        ],
+        "skills": [{"name": f"Area {i}", "keywords": ["Python", "Go", "SQL", "Redis"]} for i in range(6)],
+        "education": [{"institution": "University", "studyType": "BSc", "startDate": "2010", "endDate": "2014"}],
+    }
+
+def sample_html(size_kb: int, variant: int = 0) -> str:
+    """
+    A styled HTML document of roughly size_kb kilobytes
+
+    Args:
+        size_kb: Target size; paragraphs and table rows are added until reached
+        variant: Changes the heading only, giving a distinct cache key
+    """
+    head = (
+        "<html><head><style>"
+        "body { font-family: sans-serif; font-size: 10pt; } "
+        "table { border-collapse: collapse; width: 100%; } "
+        "td { border: 1px solid #ccc; padding: 2px 4px; }"
+        "</style></head><body>"
+        f"<h1>Document {variant}</h1>"
+    )
+    parts = [head]
+    size, i = len(head), 0
+    while size < size_kb * 1024:
+        block = (
+            f"<h2>Section {i}</h2>"
+            f"<p>{'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 6}</p>"
+            "<table>"
+            + "".join(f"<tr><td>Row {i}.{r}</td><td>{r * 17 % 101}</td><td>Value</td></tr>" for r in range(8))
+            + "</table>"
+        )
+        parts.append(block)
+        size += len(block)
+        i += 1
+    parts.append("</body></html>")
+    return "".join(parts)
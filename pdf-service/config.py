@@ -20,17 +20,88 @@ class Settings(BaseSettings):
     redis_url: str = os.getenv("REDIS_URL", "redis://redis:6379")
     redis_db: int = int(os.getenv("REDIS_DB", "0"))
     redis_password: Optional[str] = os.getenv("REDIS_PASSWORD")
+    redis_max_connections: int = int(os.getenv("REDIS_MAX_CONNECTIONS", "20"))
+    redis_socket_timeout: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.25"))
+    redis_connect_timeout: float = float(os.getenv("REDIS_CONNECT_TIMEOUT", "0.25"))
+    redis_breaker_failures: int = int(os.getenv("REDIS_BREAKER_FAILURES", "5"))
+    redis_breaker_reset_seconds: float = float(os.getenv("REDIS_BREAKER_RESET_SECONDS", "30"))
     
     # Cache
-    cache_ttl: int = int(os.getenv("CACHE_TTL", "3600"))
-    cache_max_size: int = int(os.getenv("CACHE_MAX_SIZE", "1000"))
+    # PDF_CACHE_TTL is the name the cache module used to read
+    cache_ttl: int = int(os.getenv("CACHE_TTL", os.getenv("PDF_CACHE_TTL", "3600")))
+    cache_max_size: int = int(os.getenv("CACHE_MAX_SIZE", "1000"))  # L1 entries
+    cache_l1_max_bytes: int = int(os.getenv("CACHE_L1_MAX_BYTES", str(64 * 1024 * 1024)))
+    cache_compression_level: int = int(os.getenv("CACHE_COMPRESSION_LEVEL", "6"))
+    cache_compression_min_saving: float = float(os.getenv("CACHE_COMPRESSION_MIN_SAVING", "0.05"))
     
     # PDF Generation
     pdf_font_path: Optional[str] = os.getenv("PDF_FONT_PATH")
+    # The only place documents may load images, fonts and stylesheets from
+    pdf_asset_dir: str = os.getenv("PDF_ASSET_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets"))
+    # Images, fonts and stylesheets fetched by a render worker are cached in it
+    pdf_asset_cache_max_mb: int = int(os.getenv("PDF_ASSET_CACHE_MAX_MB", "32"))
+    pdf_asset_max_mb: int = int(os.getenv("PDF_ASSET_MAX_MB", "10"))  # per resource
+    pdf_asset_fetch_timeout: float = float(os.getenv("PDF_ASSET_FETCH_TIMEOUT", "2"))  # per resource
     pdf_page_width: float = float(os.getenv("PDF_PAGE_WIDTH", "8.27"))
     pdf_page_height: float = float(os.getenv("PDF_PAGE_HEIGHT", "11.69"))
+    # ETags make revalidation cheap, so clients check back on every use by default
+    pdf_cache_control: str = os.getenv("PDF_CACHE_CONTROL", "private, no-cache")
+    pdf_stream_chunk_size: int = int(os.getenv("PDF_STREAM_CHUNK_SIZE", str(64 * 1024)))
+    
+    # Render pool
+    render_workers: int = int(os.getenv("RENDER_WORKERS", str(os.cpu_count() or 2)))
+    render_max_renders_per_worker: int = int(os.getenv("RENDER_MAX_RENDERS_PER_WORKER", "200"))
+    render_max_rss_mb: int = int(os.getenv("RENDER_MAX_RSS_MB", "512"))
+    render_start_method: str = os.getenv("RENDER_START_METHOD", "spawn")
+    # Admission: longest estimated queue wait accepted per lane, in seconds (0: never refuse)
+    render_max_wait_interactive: float = float(os.getenv("RENDER_MAX_WAIT_INTERACTIVE", "10"))
+    render_max_wait_preview: float = float(os.getenv("RENDER_MAX_WAIT_PREVIEW", "20"))
+    render_max_wait_batch: float = float(os.getenv("RENDER_MAX_WAIT_BATCH", "0"))
+    render_max_queued: int = int(os.getenv("RENDER_MAX_QUEUED", "100"))  # across all lanes
+    render_expected_seconds: float = float(os.getenv("RENDER_EXPECTED_SECONDS", "1.0"))  # until measured
+    # Deadline of a render, queueing included; requests may ask for their own up to the cap
+    render_timeout: float = float(os.getenv("RENDER_TIMEOUT", "30"))
+    render_max_timeout: float = float(os.getenv("RENDER_MAX_TIMEOUT", "120"))
+    render_stylesheet_cache_size: int = int(os.getenv("RENDER_STYLESHEET_CACHE_SIZE", "32"))
+    # Laid-out documents kept per worker for page-range and metadata variants
+    render_document_cache_size: int = int(os.getenv("RENDER_DOCUMENT_CACHE_SIZE", "8"))
+    render_document_cache_max_mb: int = int(os.getenv("RENDER_DOCUMENT_CACHE_MAX_MB", "64"))
+    
+    # Batch rendering
+    batch_max_items: int = int(os.getenv("BATCH_MAX_ITEMS", "200"))
+    batch_concurrency: int = int(os.getenv("BATCH_CONCURRENCY", str(os.cpu_count() or 2)))
+    
+    # Render jobs
+    job_backend: str = os.getenv("JOB_BACKEND", "redis")  # redis or memory
+    job_ttl: int = int(os.getenv("JOB_TTL", str(24 * 3600)))
+    # A claimed job with no progress for this long is assumed lost with its worker and requeued
+    job_stale_seconds: int = int(os.getenv("JOB_STALE_SECONDS", "300"))
+    # Consumers run inside the API process; set to 0 when worker.py runs separately
+    job_inprocess_workers: int = int(os.getenv("JOB_INPROCESS_WORKERS", "1"))
+    
+    # Readiness: when false, /ready does not wait for Redis and the service starts uncached
+    ready_require_redis: bool = os.getenv("READY_REQUIRE_REDIS", "true").lower() == "true"
+    
+    # Profiling: requests with X-Profile-Token set to this token are profiled
+    profile_token: Optional[str] = os.getenv("PROFILE_TOKEN")
+    profile_sample_rate: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # fraction of all requests
+    profile_interval_ms: float = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+    profile_ttl: int = int(os.getenv("PROFILE_TTL", "900"))  # seconds a stored profile is kept
+    
+    # Cache warm-up
+    warmup_manifest_path: Optional[str] = os.getenv("WARMUP_MANIFEST_PATH")  # JSON list of requests
+    warmup_redis_set: Optional[str] = os.getenv("WARMUP_REDIS_SET")  # Redis set of JSON requests
+    warmup_concurrency: int = int(os.getenv("WARMUP_CONCURRENCY", "2"))
+    warmup_ready_fraction: float = float(os.getenv("WARMUP_READY_FRACTION", "0.9"))
+    # Report ready anyway after this many seconds short of the fraction; 0 waits indefinitely
+    warmup_ready_timeout: float = float(os.getenv("WARMUP_READY_TIMEOUT", "600"))
+    # Re-run warm-up so entries are rendered again as they expire; 0 runs it once
+    warmup_interval: int = int(os.getenv("WARMUP_INTERVAL", "0"))
     
     class Config:
         """Pydantic configuration."""
         env_file = ".env"
         case_sensitive = False
+
+
+settings = Settings()
@@ -1,18 +1,37 @@
+import time
+
+# Measured from here so startup logs can report how long imports took
+_import_start = time.perf_counter()
+
 from fastapi import FastAPI, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
-from pydantic import BaseModel, Field, validator
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from contextlib import asynccontextmanager
-from services.pdf_generator import generate_pdf_from_html
-from services.cache import get_cached_pdf, cache_pdf
+from typing import Optional, Union
+from models import PDFRequest, ResumeDataRequest, ResumeLayoutRequest, BatchRequest
+from config import settings
+from services.pdf_generator import (
+    LANES, INTERACTIVE, RenderQueueFullError, RenderTimeoutError, asset_cache_stats, layout_cache_stats,
+    render_lane, render_pool_stats, shutdown_render_pool
+)
+from services.cache import get_cached_entry, get_cache_stats
+from services.redis_client import breaker as redis_breaker, close_redis_connection
+from services.resume_template import available_themes, get_theme
+from services.documents import document_cache_key, render_once, stream_batch_zip
+from services.layout import resume_layout
+from services import metrics, profiling
+from services.readiness import start_readiness, state as readiness
+from services.warmup import progress as warmup_progress
+from services.jobs import DONE, FAILED, get_job, get_job_backend, get_job_result, start_job_workers, submit_job
 from utils.security import sanitize_html
-from typing import Dict, Any, Optional
+from utils.http import CancelOnDisconnectMiddleware, make_etag, etag_matches, not_modified_response, pdf_response
+import asyncio
 import logging
-import time
 import os
 import uuid
-import json
+
+IMPORT_TIME = time.perf_counter() - _import_start
 
 # Configure logging
 log_level = os.getenv("LOG_LEVEL", "INFO").upper()
@@ -22,51 +41,22 @@ logging.basicConfig(
 )
 logger = logging.getLogger("pdf-service")
 
-# Pydantic models
-class PDFRequest(BaseModel):
-    html: str = Field(..., min_length=10, max_length=500000)
-    filename: str = Field("document.pdf", max_length=255)
-    page_size: str = Field("A4", pattern="^(A3|A4|A5|Letter|Legal)$")
-    margin: str = Field("0.5in", pattern="^\\d+(\\.\\d+)?(in|mm|cm|px)$")
-
-class ResumeDataRequest(BaseModel):
-    resume_data: Dict[str, Any] = Field(...)
-    filename: str = Field("resume.pdf", max_length=255)
-    page_size: str = Field("A4", pattern="^(A3|A4|A5|Letter|Legal)$")
-    margin: str = Field("0.5in", pattern="^\\d+(\\.\\d+)?(in|mm|cm|px)$")
-    
-    @validator("filename")
-    def validate_filename(cls, v):
-        # Remove any path traversal attempts
-        return os.path.basename(v)
-
-class ResumeDataRequest(BaseModel):
-    resume_data: Dict[str, Any] = Field(...)
-    filename: str = Field("resume.pdf", max_length=255)
-    page_size: str = Field("A4", pattern="^(A3|A4|A5|Letter|Legal)$")
-    margin: str = Field("0.5in", pattern="^\\d+(\\.\\d+)?(in|mm|cm|px)$")
-    
-    @validator("filename")
-    def validate_filename(cls, v):
-        return os.path.basename(v)
-
-    @validator("html")
-    def validate_html(cls, v):
-        # Basic validation to prevent extremely large payloads
-        if len(v) > 500000:  # 500KB
-            raise ValueError("HTML content too large")
-        return v
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
     logger.info("Starting PDF service...")
-    # Initialize any resources here
+    job_workers = start_job_workers(settings.job_inprocess_workers)
+    background = job_workers + [start_readiness(IMPORT_TIME)]
     
     yield
     
     logger.info("Shutting down PDF service...")
-    # Cleanup resources here
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    await get_job_backend().close()
+    await close_redis_connection()
+    shutdown_render_pool()
 
 # Create FastAPI app
 app = FastAPI(
@@ -76,6 +66,9 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Innermost, so a disconnect cancels the handler and nothing else
+app.add_middleware(CancelOnDisconnectMiddleware)
+
 # Configure CORS
 allowed_origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000,http://web:3000").split(",")
 app.add_middleware(
@@ -83,7 +76,11 @@ app.add_middleware(
     allow_origins=allowed_origins,
     allow_credentials=True,
     allow_methods=["GET", "POST"],
-    allow_headers=["Content-Type", "Authorization"],
+    allow_headers=["Content-Type", "Authorization", "If-None-Match", "Range", "If-Range", "X-Render-Priority"],
+    expose_headers=[
+        "ETag", "X-Cache", "X-Request-ID", "X-Profile-ID", "Retry-After", "Accept-Ranges", "Content-Range",
+        "Content-Length", "X-PDF-Quality", "X-PDF-Size", "X-PDF-Optimize-Time"
+    ],
 )
 
 # Configure trusted hosts
@@ -93,6 +90,13 @@ app.add_middleware(
     allowed_hosts=allowed_hosts
 )
 
+# Only installed when enabled, so unprofiled deployments pay nothing for it
+if profiling.enabled():
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+# Outermost, so request and response timings cover the other middleware
+app.add_middleware(metrics.MetricsMiddleware)
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -100,7 +104,102 @@ async def health_check():
         "status": "healthy",
         "timestamp": time.time(),
         "service": "pdf-generation",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "redis": redis_breaker.stats(),
+        "render_pool": render_pool_stats(),
+        "warmup": warmup_progress.to_dict()
+    }
+
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness probe, distinct from /health
+    
+    Returns:
+        200 once the render workers have passed a test render, Redis has
+        answered and cache warm-up has reached WARMUP_READY_FRACTION,
+        503 until then, with the state and timing of each check
+    """
+    report = readiness.to_dict()
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
+
+def _select_lane(req: Request) -> None:
+    """
+    Queue this request's renders in the lane it asks for with X-Render-Priority
+    
+    Interactive is the default and the highest lane, so a client can only
+    lower its own priority, e.g. for admin previews.
+    """
+    lane = req.headers.get("x-render-priority", INTERACTIVE).lower()
+    render_lane.set(lane if lane in LANES else INTERACTIVE)
+
+def _output_headers(
+    request: Union[PDFRequest, ResumeDataRequest], size: int, optimize_time: Optional[float] = None
+) -> dict:
+    """Report the quality profile and size of a PDF, and how long writing it under that profile took"""
+    headers = {"X-PDF-Quality": request.quality, "X-PDF-Size": str(size)}
+    if optimize_time is not None:
+        headers["X-PDF-Optimize-Time"] = f"{optimize_time:.4f}"
+    return headers
+
+def _render_timeout(endpoint: str, error: RenderTimeoutError) -> HTTPException:
+    logger.warning(f"{endpoint} request timed out: {str(error)}")
+    metrics.count(endpoint, "timeout")
+    return HTTPException(
+        status_code=504,
+        detail=f"The render did not finish within its {error.timeout:g}s deadline"
+    )
+
+def _cancelled(endpoint: str) -> None:
+    logger.info(f"{endpoint} request cancelled: client disconnected")
+    metrics.count(endpoint, "cancelled")
+
+def _queue_full(endpoint: str, error: RenderQueueFullError) -> HTTPException:
+    logger.warning(f"Rejected {endpoint} request: {str(error)}")
+    metrics.count(endpoint, "rejected")
+    return HTTPException(
+        status_code=429,
+        detail="The render queue is full. Please try again later.",
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Cache tier counters, plus the laid-out documents and assets held by render workers"""
+    return {**await get_cache_stats(), "layouts": layout_cache_stats(), "assets": asset_cache_stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Stage latency histograms, request outcome counters and render pool gauges"""
+    return PlainTextResponse(metrics.render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/profiles/{request_id}", response_class=PlainTextResponse)
+async def get_profile(request_id: str, req: Request):
+    """
+    Serve the profile captured for a request
+    
+    Returns:
+        Folded stacks ("frame;frame;frame count" per line) for flamegraph.pl,
+        inferno or speedscope
+    """
+    if not settings.profile_token:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not profiling.token_matches(req.headers.get(profiling.PROFILE_TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail="Invalid profile token")
+    
+    folded = await profiling.load_profile(request_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Profile not found or expired")
+    return PlainTextResponse(folded)
+
+@app.get("/api/themes")
+async def list_themes():
+    """Resume themes that /api/resume-pdf accepts, with their version hashes"""
+    return {
+        "themes": [
+            {"name": name, "version": get_theme(name).version}
+            for name in available_themes()
+        ]
     }
 
 @app.post("/api/pdf")
@@ -115,6 +214,8 @@ async def generate_pdf(request: PDFRequest, req: Request):
     Returns:
         StreamingResponse with PDF content
     """
+    metrics.request_parsed(req.scope)
+    _select_lane(req)
     try:
         start_time = time.time()
         request_id = str(uuid.uuid4())
@@ -127,57 +228,60 @@ async def generate_pdf(request: PDFRequest, req: Request):
             f"Client: {req.client.host if req.client else 'unknown'}"
         )
         
-        # For PDF generation, skip sanitization to preserve HTML structure
-        sanitized_html = request.html
-        
         # Check cache first
-        cached_pdf = await get_cached_pdf(sanitized_html)
-        if cached_pdf:
+        cache_key = document_cache_key(request)
+        etag = make_etag(cache_key)
+        
+        # The client already holds this exact PDF; skip the cache and renderer entirely
+        if etag_matches(req, etag):
+            logger.info(f"PDF not modified [ID: {request_id}]")
+            metrics.count("/api/pdf", "not_modified")
+            return not_modified_response(request_id, etag)
+        
+        cached = await get_cached_entry(cache_key)
+        if cached:
             logger.info(f"PDF retrieved from cache [ID: {request_id}]")
+            metrics.count("/api/pdf", "hit")
             generation_time = time.time() - start_time
             logger.info(f"PDF generation completed in {generation_time:.2f}s [ID: {request_id}]")
             
-            return StreamingResponse(
-                content=iter([cached_pdf]),
-                media_type="application/pdf",
-                headers={
-                    "Content-Disposition": f'attachment; filename="{request.filename}"',
-                    "X-Request-ID": request_id,
-                    "X-Cache": "HIT"
-                }
+            return pdf_response(
+                req, cached.pdf_bytes, request.filename, request_id, etag, "HIT",
+                _output_headers(request, len(cached.pdf_bytes), cached.metadata.get("optimize_time"))
             )
         
-        # Generate PDF
-        pdf_bytes = await generate_pdf_from_html(
-            sanitized_html,
-            page_size=request.page_size,
-            margin=request.margin
-        )
-        
-        # Cache the PDF
-        await cache_pdf(sanitized_html, pdf_bytes)
+        rendered, cache_status = await render_once(request, cache_key)
+        metrics.count("/api/pdf", cache_status.lower())
         
         generation_time = time.time() - start_time
-        logger.info(f"PDF generated and cached in {generation_time:.2f}s [ID: {request_id}]")
+        logger.info(
+            f"PDF generated and cached in {generation_time:.2f}s "
+            f"[ID: {request_id}, cache: {cache_status}, quality: {request.quality}, size: {len(rendered.pdf_bytes)}]"
+        )
         
-        return StreamingResponse(
-            content=iter([pdf_bytes]),
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f'attachment; filename="{request.filename}"',
-                "X-Request-ID": request_id,
-                "X-Cache": "MISS"
-            }
+        return pdf_response(
+            req, rendered.pdf_bytes, request.filename, request_id, etag, cache_status,
+            _output_headers(request, len(rendered.pdf_bytes), rendered.optimize_time)
         )
         
+    except asyncio.CancelledError:
+        _cancelled("/api/pdf")
+        raise
+    except RenderQueueFullError as qe:
+        raise _queue_full("/api/pdf", qe)
+    except RenderTimeoutError as te:
+        raise _render_timeout("/api/pdf", te)
     except HTTPException as he:
         logger.error(f"HTTP error generating PDF: {he.detail}")
+        metrics.count("/api/pdf", "error")
         raise
     except ValueError as ve:
         logger.error(f"Validation error: {str(ve)}")
+        metrics.count("/api/pdf", "error")
         raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
         logger.exception(f"Unexpected error generating PDF: {str(e)}")
+        metrics.count("/api/pdf", "error")
         raise HTTPException(
             status_code=500,
             detail="An unexpected error occurred while generating the PDF"
@@ -195,9 +299,9 @@ async def generate_resume_pdf(request: ResumeDataRequest, req: Request):
     Returns:
         StreamingResponse with PDF content
     """
+    metrics.request_parsed(req.scope)
+    _select_lane(req)
     try:
-        from services.resume_template import generate_resume_html
-        
         start_time = time.time()
         request_id = str(uuid.uuid4())
         
@@ -207,67 +311,218 @@ async def generate_resume_pdf(request: ResumeDataRequest, req: Request):
             f"Client: {req.client.host if req.client else 'unknown'}"
         )
         
-        # Generate HTML from resume data
-        html_content = generate_resume_html(request.resume_data)
+        # Check cache first; the key is built from the request so a hit skips templating
+        cache_key = document_cache_key(request)
+        etag = make_etag(cache_key)
         
-        # Check cache first
-        cache_key = json.dumps(request.resume_data, sort_keys=True)
-        cached_pdf = await get_cached_pdf(cache_key)
-        if cached_pdf:
+        # The client already holds this exact PDF; skip the cache and renderer entirely
+        if etag_matches(req, etag):
+            logger.info(f"Resume PDF not modified [ID: {request_id}]")
+            metrics.count("/api/resume-pdf", "not_modified")
+            return not_modified_response(request_id, etag)
+        
+        cached = await get_cached_entry(cache_key)
+        if cached:
             logger.info(f"Resume PDF retrieved from cache [ID: {request_id}]")
+            metrics.count("/api/resume-pdf", "hit")
             generation_time = time.time() - start_time
             logger.info(f"Resume PDF generation completed in {generation_time:.2f}s [ID: {request_id}]")
             
-            return StreamingResponse(
-                content=iter([cached_pdf]),
-                media_type="application/pdf",
-                headers={
-                    "Content-Disposition": f'attachment; filename="{request.filename}"',
-                    "X-Request-ID": request_id,
-                    "X-Cache": "HIT"
-                }
+            return pdf_response(
+                req, cached.pdf_bytes, request.filename, request_id, etag, "HIT",
+                _output_headers(request, len(cached.pdf_bytes), cached.metadata.get("optimize_time"))
             )
         
-        # Generate PDF
-        pdf_bytes = await generate_pdf_from_html(
-            html_content,
-            page_size=request.page_size,
-            margin=request.margin
-        )
-        
-        # Cache the PDF
-        await cache_pdf(cache_key, pdf_bytes)
+        rendered, cache_status = await render_once(request, cache_key)
+        metrics.count("/api/resume-pdf", cache_status.lower())
         
         generation_time = time.time() - start_time
-        logger.info(f"Resume PDF generated and cached in {generation_time:.2f}s [ID: {request_id}]")
+        logger.info(
+            f"Resume PDF generated and cached in {generation_time:.2f}s "
+            f"[ID: {request_id}, cache: {cache_status}, quality: {request.quality}, size: {len(rendered.pdf_bytes)}]"
+        )
         
-        return StreamingResponse(
-            content=iter([pdf_bytes]),
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f'attachment; filename="{request.filename}"',
-                "X-Request-ID": request_id,
-                "X-Cache": "MISS"
-            }
+        return pdf_response(
+            req, rendered.pdf_bytes, request.filename, request_id, etag, cache_status,
+            _output_headers(request, len(rendered.pdf_bytes), rendered.optimize_time)
         )
         
+    except asyncio.CancelledError:
+        _cancelled("/api/resume-pdf")
+        raise
+    except RenderQueueFullError as qe:
+        raise _queue_full("/api/resume-pdf", qe)
+    except RenderTimeoutError as te:
+        raise _render_timeout("/api/resume-pdf", te)
+    except ValueError as ve:
+        logger.error(f"Validation error: {str(ve)}")
+        metrics.count("/api/resume-pdf", "error")
+        raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
         logger.exception(f"Unexpected error generating resume PDF: {str(e)}")
+        metrics.count("/api/resume-pdf", "error")
         raise HTTPException(
             status_code=500,
             detail="An unexpected error occurred while generating the resume PDF"
         )
 
+@app.post("/api/resume-layout")
+async def check_resume_layout(request: ResumeLayoutRequest, req: Request):
+    """
+    Lay out a resume without generating the PDF
+    
+    Args:
+        request: ResumeLayoutRequest containing resume data, options and page budget
+        req: FastAPI Request object for client info
+        
+    Returns:
+        JSON with page count, per-section page positions and overflow warnings
+    """
+    metrics.request_parsed(req.scope)
+    _select_lane(req)
+    try:
+        start_time = time.time()
+        request_id = str(uuid.uuid4())
+        
+        layout, cache_status = await resume_layout(request)
+        metrics.count("/api/resume-layout", cache_status.lower())
+        
+        logger.info(
+            f"Resume layout checked in {time.time() - start_time:.3f}s "
+            f"[ID: {request_id}, pages: {layout['page_count']}, cache: {cache_status}]"
+        )
+        return JSONResponse(
+            content=layout,
+            headers={"X-Request-ID": request_id, "X-Cache": cache_status}
+        )
+        
+    except asyncio.CancelledError:
+        _cancelled("/api/resume-layout")
+        raise
+    except RenderQueueFullError as qe:
+        raise _queue_full("/api/resume-layout", qe)
+    except RenderTimeoutError as te:
+        raise _render_timeout("/api/resume-layout", te)
+    except Exception as e:
+        logger.exception(f"Unexpected error laying out resume: {str(e)}")
+        metrics.count("/api/resume-layout", "error")
+        raise HTTPException(
+            status_code=500,
+            detail="An unexpected error occurred while laying out the resume"
+        )
+
+@app.post("/api/pdf/batch")
+async def generate_pdf_batch(request: BatchRequest, req: Request):
+    """
+    Generate many PDFs and stream them back as a ZIP archive
+    
+    Args:
+        request: BatchRequest containing PDFRequest and ResumeDataRequest items
+        req: FastAPI Request object for client info
+        
+    Returns:
+        StreamingResponse with a ZIP of the PDFs and a manifest.json
+        reporting the outcome of every item
+    """
+    metrics.request_parsed(req.scope)
+    request_id = str(uuid.uuid4())
+    logger.info(
+        f"Batch PDF generation request [ID: {request_id}] - "
+        f"Items: {len(request.items)}, "
+        f"Client: {req.client.host if req.client else 'unknown'}"
+    )
+    
+    return StreamingResponse(
+        content=stream_batch_zip(request.items),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{request.filename}"',
+            "X-Request-ID": request_id
+        }
+    )
+
+@app.post("/api/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def create_job(request: Union[PDFRequest, ResumeDataRequest], req: Request):
+    """
+    Queue a PDF render and return immediately
+    
+    Args:
+        request: PDFRequest or ResumeDataRequest to render
+        req: FastAPI Request object for client info
+        
+    Returns:
+        Job ID with URLs to poll its status and fetch its result
+    """
+    metrics.request_parsed(req.scope)
+    try:
+        job = await submit_job(request)
+    except Exception as e:
+        logger.exception(f"Unable to queue render job: {str(e)}")
+        raise HTTPException(status_code=503, detail="Render job queue is unavailable")
+    
+    logger.info(
+        f"Render job queued [ID: {job['id']}] - "
+        f"Filename: {request.filename}, "
+        f"Client: {req.client.host if req.client else 'unknown'}"
+    )
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "status_url": f"/api/jobs/{job['id']}",
+        "result_url": f"/api/jobs/{job['id']}/result"
+    }
+
+async def _lookup_job(job_id: str) -> dict:
+    try:
+        job = await get_job(job_id)
+    except Exception as e:
+        logger.exception(f"Unable to read render job {job_id}: {str(e)}")
+        raise HTTPException(status_code=503, detail="Render job store is unavailable")
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+@app.get("/api/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Status, stage and progress of a render job"""
+    return await _lookup_job(job_id)
+
+@app.get("/api/jobs/{job_id}/result")
+async def job_result(job_id: str, req: Request):
+    """
+    Download the PDF of a finished render job
+    
+    Returns:
+        StreamingResponse with PDF content, 409 while the job is still
+        pending and 500 if it failed
+    """
+    job = await _lookup_job(job_id)
+    if job["status"] == FAILED:
+        raise HTTPException(status_code=500, detail=f"Render job failed: {job['error']}")
+    if job["status"] != DONE:
+        raise HTTPException(status_code=409, detail=f"Render job is {job['status']}")
+    
+    etag = make_etag(job["cache_key"])
+    if etag_matches(req, etag):
+        return not_modified_response(job_id, etag)
+    
+    pdf_bytes = await get_job_result(job)
+    if pdf_bytes is None:
+        raise HTTPException(status_code=404, detail="Job result expired")
+    return pdf_response(req, pdf_bytes, job["filename"], job_id, etag, "HIT")
+
 @app.exception_handler(429)
 async def rate_limit_handler(request: Request, exc: HTTPException):
-    """Custom handler for rate limit exceeded errors"""
+    """Custom handler for rate limit and render queue overload errors"""
+    retry_after = int((exc.headers or {}).get("Retry-After", 60))
     return JSONResponse(
         status_code=429,
         content={
             "error": "Rate limit exceeded",
-            "detail": "Too many requests. Please try again later.",
-            "retry_after": 60
-        }
+            "detail": exc.detail if exc.detail != "Too Many Requests" else "Too many requests. Please try again later.",
+            "retry_after": retry_after
+        },
+        headers={"Retry-After": str(retry_after)}
     )
 
 @app.exception_handler(413)
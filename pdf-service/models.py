@@ -0,0 +1,79 @@
+"""
+Request models for the PDF service.
+"""
+
+import os
+from typing import Any, Dict, List, Optional, Union
+from pydantic import BaseModel, Field, validator
+from config import settings
+from services.resume_template import DEFAULT_THEME, available_themes
+
+
+class RenderOptions(BaseModel):
+    """Render options shared by every request that produces a PDF"""
+    page_size: str = Field("A4", pattern="^(A3|A4|A5|Letter|Legal)$")
+    margin: str = Field("0.5in", pattern="^\\d+(\\.\\d+)?(in|mm|cm|px)$")
+    # Export variants, produced from the cached layout of the same document
+    pages: Optional[str] = Field(None, max_length=100, pattern="^\\d+(-\\d*)?(,\\d+(-\\d*)?)*$")
+    title: Optional[str] = Field(None, max_length=200)
+    author: Optional[str] = Field(None, max_length=200)
+    # Render deadline in seconds, capped at RENDER_MAX_TIMEOUT
+    timeout: Optional[float] = Field(None, gt=0)
+    # Output profile trading file size for image and font fidelity
+    quality: str = Field("print", pattern="^(screen|print|archive)$")
+
+    @validator("pages")
+    def validate_pages(cls, v):
+        # The pattern checks the syntax; also refuse ranges no document has, like "0" or "3-1"
+        if v is None:
+            return v
+        for part in v.split(","):
+            first, _, last = part.partition("-")
+            if int(first) < 1 or (last and int(last) < int(first)):
+                raise ValueError(f"Invalid page range {part}")
+        return v
+
+class PDFRequest(RenderOptions):
+    html: str = Field(..., min_length=10, max_length=500000)
+    filename: str = Field("document.pdf", max_length=255)
+    
+    @validator("filename")
+    def validate_filename(cls, v):
+        # Remove any path traversal attempts
+        return os.path.basename(v)
+
+    @validator("html")
+    def validate_html(cls, v):
+        # Basic validation to prevent extremely large payloads
+        if len(v) > 500000:  # 500KB
+            raise ValueError("HTML content too large")
+        return v
+
+class ResumeDataRequest(RenderOptions):
+    resume_data: Dict[str, Any] = Field(...)
+    filename: str = Field("resume.pdf", max_length=255)
+    theme: str = Field(DEFAULT_THEME, max_length=50)
+    
+    @validator("filename")
+    def validate_filename(cls, v):
+        return os.path.basename(v)
+
+    @validator("theme")
+    def validate_theme(cls, v):
+        if v not in available_themes():
+            raise ValueError(f"Unknown theme; available: {', '.join(available_themes())}")
+        return v
+
+class ResumeLayoutRequest(ResumeDataRequest):
+    # Page budget the layout is checked against
+    max_pages: int = Field(1, ge=1, le=20)
+
+class BatchRequest(BaseModel):
+    items: List[Union[PDFRequest, ResumeDataRequest]] = Field(
+        ..., min_length=1, max_length=settings.batch_max_items
+    )
+    filename: str = Field("documents.zip", max_length=255)
+    
+    @validator("filename")
+    def validate_filename(cls, v):
+        return os.path.basename(v)
@@ -4,6 +4,13 @@ Services package for PDF generation and caching.
 """
 
 from .pdf_generator import generate_pdf_from_html
-from .cache import get_cached_pdf, cache_pdf
+from .cache import get_cached_pdf, get_cached_entry, get_cached_pdfs, cache_pdf, get_cache_stats
 
-__all__ = ["generate_pdf_from_html", "get_cached_pdf", "cache_pdf"]
+__all__ = [
+    "generate_pdf_from_html",
+    "get_cached_pdf",
+    "get_cached_entry",
+    "get_cached_pdfs",
+    "cache_pdf",
+    "get_cache_stats",
+]
@@ -1,71 +1,260 @@
+import asyncio
 import logging
-import hashlib
-import redis.asyncio as redis
-import os
-from typing import Optional
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from config import settings
+from services import codec, metrics, redis_client
+from services.redis_client import RedisUnavailableError
 
 logger = logging.getLogger("pdf-service")
 
-# Redis connection
-_redis = None
-_CACHE_TTL = int(os.getenv("PDF_CACHE_TTL", 3600))  # 1 hour default
+# Frames larger than this are encoded/decoded off the event loop
+_CODEC_THREAD_THRESHOLD = 256 * 1024
 
-async def get_redis_connection():
-    """Get or create Redis connection"""
-    global _redis
-    if _redis is None:
-        redis_url = os.getenv("REDIS_URL", "redis://redis:6379")
-        _redis = redis.from_url(redis_url, decode_responses=False)
-        logger.info(f"Connected to Redis at {redis_url}")
-    return _redis
+class CachedPDF(NamedTuple):
+    """A cached PDF and the metadata stored with it (page_count, render_time, ...)"""
+    pdf_bytes: bytes
+    metadata: Dict[str, Any]
 
-async def get_cached_pdf(html_content: str) -> Optional[bytes]:
+class LRUByteCache:
     """
-    Get cached PDF from Redis
-    
+    In-process LRU cache bounded by total bytes and entry count
+
     Args:
-        html_content: HTML content to generate cache key from
-        
+        max_bytes: Upper bound on the summed size of all values
+        max_entries: Upper bound on the number of entries
+    """
+
+    def __init__(self, max_bytes: int, max_entries: int):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[bytes, Dict[str, Any], float]]" = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key: str) -> Optional[Tuple[bytes, Dict[str, Any]]]:
+        """Value and metadata stored under key, or None on a miss"""
+        entry = self._entries.get(key)
+        if entry is None or entry[2] < time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0], entry[1]
+
+    def set(self, key: str, value: bytes, ttl: float, metadata: Optional[Dict[str, Any]] = None) -> None:
+        if len(value) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, metadata or {}, time.monotonic() + ttl)
+        self.size_bytes += len(value)
+        while self.size_bytes > self.max_bytes or len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        value, _, _ = self._entries.pop(key)
+        self.size_bytes -= len(value)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+# L1: hot PDFs served without network I/O; L2 (Redis) is shared between instances
+_l1 = LRUByteCache(settings.cache_l1_max_bytes, settings.cache_max_size)
+_l2_stats = {"hits": 0, "misses": 0, "errors": 0, "skipped": 0}
+
+def _promotion_ttl(pttl: int) -> float:
+    """L1 lifetime of an entry read from Redis: no longer than it has left there"""
+    if pttl < 0:
+        # No expiry set on the key
+        return settings.cache_ttl
+    return min(settings.cache_ttl, pttl / 1000)
+
+async def _get_with_pttl(r, cache_keys: List[str]) -> List[Tuple[Optional[bytes], int]]:
+    """Read entries and their remaining lifetimes in one round trip"""
+    async with r.pipeline(transaction=True) as pipe:
+        for cache_key in cache_keys:
+            pipe.get(cache_key)
+            pipe.pttl(cache_key)
+        results = await pipe.execute()
+    return list(zip(results[::2], results[1::2]))
+
+async def get_cached_pdf(cache_key: str) -> Optional[bytes]:
+    """
+    Get cached PDF from the in-process cache, falling back to Redis
+
+    Args:
+        cache_key: Key built by services.cache_keys
+
     Returns:
         Cached PDF bytes or None if not found
     """
+    entry = await get_cached_entry(cache_key)
+    return entry.pdf_bytes if entry is not None else None
+
+@metrics.timed("cache_get")
+async def get_cached_entry(cache_key: str) -> Optional[CachedPDF]:
+    """
+    Get a cached PDF with its metadata, from the in-process cache or Redis
+
+    Args:
+        cache_key: Key built by services.cache_keys
+
+    Returns:
+        CachedPDF or None if not found
+    """
+    entry = _l1.get_entry(cache_key)
+    if entry is not None:
+        logger.debug(f"L1 cache hit for key: {cache_key}")
+        return CachedPDF(*entry)
+
     try:
-        redis = await get_redis_connection()
-        cache_key = _generate_cache_key(html_content)
-        
-        cached_pdf = await redis.get(cache_key)
-        if cached_pdf:
-            logger.debug(f"Cache hit for key: {cache_key}")
-            return cached_pdf
+        [(cached, pttl)] = await redis_client.execute(lambda r: _get_with_pttl(r, [cache_key]))
+        if cached:
+            decoded = await _run_codec(codec.decode_entry, cached)
+            _l2_stats["hits"] += 1
+            logger.debug(f"L2 cache hit for key: {cache_key}")
+            # Promote so the next hit on this instance skips Redis
+            _l1.set(cache_key, decoded.pdf_bytes, _promotion_ttl(pttl), decoded.metadata)
+            return CachedPDF(decoded.pdf_bytes, decoded.metadata)
+        _l2_stats["misses"] += 1
         logger.debug(f"Cache miss for key: {cache_key}")
         return None
+    except RedisUnavailableError:
+        _l2_stats["skipped"] += 1
+        return None
     except Exception as e:
+        _l2_stats["errors"] += 1
         logger.warning(f"Error retrieving from cache: {str(e)}")
         return None
 
-async def cache_pdf(html_content: str, pdf_bytes: bytes) -> bool:
+@metrics.timed("cache_get")
+async def get_cached_pdfs(cache_keys: List[str]) -> Dict[str, bytes]:
     """
-    Cache PDF in Redis
-    
+    Look up many cached PDFs with one Redis round trip
+
+    Args:
+        cache_keys: Keys built by services.cache_keys
+
+    Returns:
+        Mapping of the keys that were found to their PDF bytes
+    """
+    found: Dict[str, bytes] = {}
+    remote: List[str] = []
+    for cache_key in dict.fromkeys(cache_keys):
+        cached_pdf = _l1.get(cache_key)
+        if cached_pdf is not None:
+            found[cache_key] = cached_pdf
+        else:
+            remote.append(cache_key)
+    if not remote:
+        return found
+
+    try:
+        values = await redis_client.execute(lambda r: _get_with_pttl(r, remote))
+    except RedisUnavailableError:
+        _l2_stats["skipped"] += len(remote)
+        return found
+    except Exception as e:
+        _l2_stats["errors"] += 1
+        logger.warning(f"Error retrieving batch from cache: {str(e)}")
+        return found
+
+    for cache_key, (cached, pttl) in zip(remote, values):
+        if not cached:
+            _l2_stats["misses"] += 1
+            continue
+        try:
+            decoded = await _run_codec(codec.decode_entry, cached)
+        except ValueError as e:
+            _l2_stats["errors"] += 1
+            logger.warning(f"Discarding unreadable cache entry {cache_key}: {str(e)}")
+            continue
+        _l2_stats["hits"] += 1
+        _l1.set(cache_key, decoded.pdf_bytes, _promotion_ttl(pttl), decoded.metadata)
+        found[cache_key] = decoded.pdf_bytes
+    return found
+
+@metrics.timed("cache_set")
+async def cache_pdf(cache_key: str, pdf_bytes: bytes, metadata: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    Cache PDF in the in-process cache and in Redis
+
     Args:
-        html_content: HTML content used to generate the PDF
+        cache_key: Key built by services.cache_keys
         pdf_bytes: PDF content to cache
-        
+        metadata: Facts stored with the entry (page_count, render_time, ...)
+
     Returns:
-        True if caching was successful
+        True if caching in Redis was successful
     """
+    _l1.set(cache_key, pdf_bytes, settings.cache_ttl, metadata)
+
+    # Don't spend time encoding a frame that can't be stored
+    if redis_client.breaker.state == redis_client.CircuitBreaker.OPEN:
+        _l2_stats["skipped"] += 1
+        return False
+
     try:
-        redis = await get_redis_connection()
-        cache_key = _generate_cache_key(html_content)
-        
-        await redis.setex(cache_key, _CACHE_TTL, pdf_bytes)
-        logger.debug(f"Cached PDF with key: {cache_key}, TTL: {_CACHE_TTL}s")
+        frame = await _run_codec(
+            codec.encode_entry,
+            pdf_bytes,
+            metadata,
+            settings.cache_compression_level,
+            settings.cache_compression_min_saving,
+        )
+        await redis_client.execute(lambda r: r.setex(cache_key, settings.cache_ttl, frame))
+        logger.debug(f"Cached PDF with key: {cache_key}, {len(frame)}/{len(pdf_bytes)} bytes, TTL: {settings.cache_ttl}s")
         return True
+    except RedisUnavailableError:
+        _l2_stats["skipped"] += 1
+        return False
     except Exception as e:
+        _l2_stats["errors"] += 1
         logger.warning(f"Error caching PDF: {str(e)}")
         return False
 
-def _generate_cache_key(html_content: str) -> str:
-    """Generate cache key from HTML content"""
-    # Use SHA-256 hash of the HTML content
-    return f"pdf:{hashlib.sha256(html_content.encode()).hexdigest()}"
\ No newline at end of file
+async def get_cache_stats() -> Dict[str, Any]:
+    """
+    Get hit, miss and eviction counters for both cache tiers
+
+    Returns:
+        Dictionary with "l1" and "l2" counters, L2 evictions from Redis INFO,
+        and "codec" byte and timing totals for stored entries
+    """
+    l2 = dict(_l2_stats)
+    try:
+        info = await redis_client.execute(lambda r: r.info("stats"))
+        l2["evictions"] = info.get("evicted_keys", 0)
+        l2["expirations"] = info.get("expired_keys", 0)
+    except Exception as e:
+        logger.warning(f"Error reading Redis stats: {str(e)}")
+        l2["evictions"] = None
+    return {"l1": _l1.stats(), "l2": l2, "codec": codec.stats.as_dict()}
+
+async def _run_codec(fn, data: bytes, *args):
+    """Run an encode/decode step, moving large payloads off the event loop"""
+    if len(data) > _CODEC_THREAD_THRESHOLD:
+        return await asyncio.to_thread(fn, data, *args)
+    return fn(data, *args)
@@ -0,0 +1,71 @@
+"""
+Canonical cache keys for generated PDFs.
+
+A key covers everything that changes the output bytes: the request payload,
+the render options and a fingerprint of the theme and rendering engine.
+Keys are computed from the request alone, so a cache hit costs one hash.
+"""
+import hashlib
+import json
+from functools import lru_cache
+from importlib import metadata
+from typing import Any, Dict
+from services.resume_template import get_theme
+
+# Bump to invalidate every cached PDF after a change the fingerprints can't see
+KEY_SCHEME_VERSION = "2"
+
+@lru_cache(maxsize=1)
+def engine_fingerprint() -> str:
+    """Fingerprint of the key scheme and the installed WeasyPrint version"""
+    try:
+        engine = metadata.version("weasyprint")
+    except metadata.PackageNotFoundError:
+        engine = "unknown"
+    return f"{KEY_SCHEME_VERSION}:weasyprint-{engine}"
+
+def canonical_json(value: Any) -> bytes:
+    """Serialize a JSON value so equal values always produce equal bytes"""
+    return json.dumps(
+        value, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    ).encode()
+
+def build_cache_key(namespace: str, payload: bytes, options: Dict[str, Any], fingerprint: str) -> str:
+    """
+    Build a cache key from its components
+
+    Args:
+        namespace: Kind of document (html, resume, ...)
+        payload: Canonical bytes of the request payload
+        options: Render options that affect the output
+        fingerprint: Template/engine version the output depends on
+
+    Returns:
+        Cache key of the form "pdf:<namespace>:<sha256>"
+    """
+    digest = hashlib.sha256()
+    for part in (namespace.encode(), fingerprint.encode(), canonical_json(options)):
+        digest.update(part)
+        digest.update(b"\0")
+    digest.update(payload)
+    return f"pdf:{namespace}:{digest.hexdigest()}"
+
+def html_cache_key(html_content: str, **options: Any) -> str:
+    """Cache key for a PDF rendered from raw HTML"""
+    return build_cache_key("html", html_content.encode(), options, engine_fingerprint())
+
+def resume_cache_key(resume_data: Dict[str, Any], theme: str, **options: Any) -> str:
+    """Cache key for a PDF rendered from resume data with a theme"""
+    return _themed_cache_key("resume", resume_data, theme, options)
+
+def layout_cache_key(resume_data: Dict[str, Any], theme: str, **options: Any) -> str:
+    """Cache key for the layout report of resume data with a theme"""
+    return _themed_cache_key("layout", resume_data, theme, options)
+
+def _themed_cache_key(namespace: str, resume_data: Dict[str, Any], theme: str, options: Dict[str, Any]) -> str:
+    return build_cache_key(
+        namespace,
+        canonical_json(resume_data),
+        {"theme": theme, **options},
+        f"{engine_fingerprint()}:{get_theme(theme).version}",
+    )
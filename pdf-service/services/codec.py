@@ -0,0 +1,136 @@
+"""
+Framed encoding for cached PDF payloads.
+
+Frame layout::
+
+    b"PDFC" | version (1 byte) | codec (1 byte) | header length (2 bytes, big-endian)
+    | header (JSON metadata) | body
+
+The body is zlib-compressed unless compression does not pay off, in which
+case it is stored raw. Values without the magic prefix are treated as raw
+PDFs written before framing existed.
+"""
+import json
+import struct
+import time
+import zlib
+from typing import Any, Dict, NamedTuple, Optional
+
+MAGIC = b"PDFC"
+FRAME_VERSION = 1
+CODEC_RAW = 0
+CODEC_ZLIB = 1
+CODEC_NAMES = {CODEC_RAW: "raw", CODEC_ZLIB: "zlib"}
+
+_PREFIX = struct.Struct(">4sBBH")
+
+class DecodedEntry(NamedTuple):
+    """A cache entry after decoding"""
+    pdf_bytes: bytes
+    metadata: Dict[str, Any]
+    codec: str
+
+class CodecStats:
+    """Running totals used to size the cache from real traffic"""
+
+    def __init__(self):
+        self.entries_encoded = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self.compressed_entries = 0
+        self.encode_seconds = 0.0
+        self.entries_decoded = 0
+        self.decode_seconds = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "entries_encoded": self.entries_encoded,
+            "compressed_entries": self.compressed_entries,
+            "raw_bytes": self.raw_bytes,
+            "stored_bytes": self.stored_bytes,
+            "compression_ratio": round(self.stored_bytes / self.raw_bytes, 4) if self.raw_bytes else None,
+            "encode_ms_total": round(self.encode_seconds * 1000, 3),
+            "entries_decoded": self.entries_decoded,
+            "decode_ms_total": round(self.decode_seconds * 1000, 3),
+        }
+
+stats = CodecStats()
+
+def encode_entry(
+    pdf_bytes: bytes,
+    metadata: Optional[Dict[str, Any]],
+    level: int,
+    min_saving: float,
+) -> bytes:
+    """
+    Encode a PDF and its metadata into a cache frame
+
+    Args:
+        pdf_bytes: PDF content
+        metadata: JSON-serializable metadata (page count, render time, ...)
+        level: zlib compression level (CACHE_COMPRESSION_LEVEL)
+        min_saving: Minimum fraction of bytes compression must save to be kept
+            (CACHE_COMPRESSION_MIN_SAVING)
+
+    Returns:
+        Framed bytes ready to store
+    """
+    start = time.perf_counter()
+    header = dict(metadata or {})
+    header.setdefault("created_at", time.time())
+    header["size"] = len(pdf_bytes)
+    header_bytes = json.dumps(header, separators=(",", ":")).encode()
+
+    codec, body = CODEC_RAW, pdf_bytes
+    compressed = zlib.compress(pdf_bytes, level)
+    if len(compressed) <= len(pdf_bytes) * (1 - min_saving):
+        codec, body = CODEC_ZLIB, compressed
+
+    frame = _PREFIX.pack(MAGIC, FRAME_VERSION, codec, len(header_bytes)) + header_bytes + body
+
+    stats.entries_encoded += 1
+    stats.compressed_entries += codec == CODEC_ZLIB
+    stats.raw_bytes += len(pdf_bytes)
+    stats.stored_bytes += len(frame)
+    stats.encode_seconds += time.perf_counter() - start
+    return frame
+
+def decode_entry(data: bytes) -> DecodedEntry:
+    """
+    Decode a cache frame
+
+    Args:
+        data: Bytes read from the cache
+
+    Returns:
+        DecodedEntry with the PDF, its metadata and the codec name
+
+    Raises:
+        ValueError: If the frame is truncated or uses an unknown version or codec
+    """
+    if not data.startswith(MAGIC):
+        return DecodedEntry(data, {}, "legacy")
+
+    start = time.perf_counter()
+    if len(data) < _PREFIX.size:
+        raise ValueError("Truncated cache frame")
+    _, version, codec, header_len = _PREFIX.unpack_from(data)
+    if version != FRAME_VERSION:
+        raise ValueError(f"Unsupported cache frame version: {version}")
+
+    header_end = _PREFIX.size + header_len
+    metadata = json.loads(data[_PREFIX.size:header_end])
+    body = memoryview(data)[header_end:]
+    if codec == CODEC_ZLIB:
+        pdf_bytes = zlib.decompress(body)
+    elif codec == CODEC_RAW:
+        pdf_bytes = bytes(body)
+    else:
+        raise ValueError(f"Unknown cache codec: {codec}")
+
+    if len(pdf_bytes) != metadata.get("size", len(pdf_bytes)):
+        raise ValueError("Cache frame size mismatch")
+
+    stats.entries_decoded += 1
+    stats.decode_seconds += time.perf_counter() - start
+    return DecodedEntry(pdf_bytes, metadata, CODEC_NAMES[codec])
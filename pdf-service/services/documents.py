@@ -0,0 +1,230 @@
+"""
+Rendering of validated PDF requests.
+
+Every endpoint that produces a PDF goes through the same steps: build the
+canonical cache key, look it up, and on a miss render once per key and cache
+the result. This module holds those steps so single, batch and background
+renders behave identically.
+"""
+import asyncio
+import json
+import logging
+import time
+import zipfile
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+from config import settings
+from models import PDFRequest, ResumeDataRequest
+from services import metrics
+from services.cache import cache_pdf, get_cached_pdfs
+from services.cache_keys import html_cache_key, resume_cache_key
+from services.pdf_generator import BATCH, RenderedPDF, RenderTimeoutError, render_lane, render_pdf_from_html
+from services.resume_template import render_resume
+from services.singleflight import SingleFlight
+
+logger = logging.getLogger("pdf-service")
+
+DocumentRequest = Union[PDFRequest, ResumeDataRequest]
+
+# Concurrent cache misses for the same key share one render
+render_flight = SingleFlight()
+
+def _variant_options(request: DocumentRequest) -> Dict[str, str]:
+    # Only set options are keyed, so plain requests share the layout's key
+    return {
+        name: value
+        for name, value in (("pages", request.pages), ("title", request.title), ("author", request.author))
+        if value
+    }
+
+@metrics.timed("cache_key")
+def _cache_key(request: DocumentRequest, **options: Any) -> str:
+    options.update(page_size=request.page_size, margin=request.margin, quality=request.quality)
+    if isinstance(request, ResumeDataRequest):
+        return resume_cache_key(request.resume_data, request.theme, **options)
+    return html_cache_key(request.html, **options)
+
+def document_cache_key(request: DocumentRequest) -> str:
+    """Build the canonical cache key for a PDF or resume request"""
+    return _cache_key(request, **_variant_options(request))
+
+def layout_key(request: DocumentRequest) -> str:
+    """
+    Build the key of a request's laid-out document
+
+    Like document_cache_key but without the page selection and metadata,
+    which are applied to an existing layout rather than changing it.
+    """
+    return _cache_key(request)
+
+async def render_to_cache(request: DocumentRequest, cache_key: str) -> RenderedPDF:
+    """
+    Render a request and store the result under its cache key
+
+    Args:
+        request: Validated PDF or resume request
+        cache_key: Key from document_cache_key
+
+    Returns:
+        RenderedPDF with the PDF bytes and render facts
+    """
+    metadata: Dict[str, Any] = {}
+    stylesheets: Tuple[str, ...] = ()
+    if isinstance(request, ResumeDataRequest):
+        # Generate HTML from resume data; the theme's CSS travels separately
+        resume = render_resume(request.resume_data, request.theme)
+        html_content, stylesheets = resume.html, resume.stylesheets
+        metadata.update(theme=resume.theme, template_time=round(resume.render_time, 6))
+        metrics.observe("html_generation", resume.render_time)
+        logger.debug(f"Rendered resume template {resume.theme} in {resume.render_time * 1000:.2f}ms")
+    else:
+        # For PDF generation, skip sanitization to preserve HTML structure
+        html_content = request.html
+
+    variant = _variant_options(request)
+    pdf_metadata = {name: variant[name] for name in ("title", "author") if name in variant}
+    rendered = await render_pdf_from_html(
+        html_content,
+        page_size=request.page_size,
+        margin=request.margin,
+        stylesheets=stylesheets,
+        layout_key=layout_key(request),
+        pages=variant.get("pages"),
+        metadata=pdf_metadata or None,
+        timeout=request.timeout,
+        quality=request.quality
+    )
+
+    metadata.update(
+        page_count=rendered.page_count,
+        render_time=rendered.render_time,
+        layout_reused=rendered.layout_reused,
+        layout_bytes=rendered.layout_bytes,
+        quality=request.quality,
+        optimize_time=rendered.optimize_time
+    )
+    await cache_pdf(cache_key, rendered.pdf_bytes, metadata)
+    return rendered
+
+async def render_once(request: DocumentRequest, cache_key: str) -> Tuple[RenderedPDF, str]:
+    """
+    Render a cache miss, joining an identical render already in flight
+
+    Returns:
+        Tuple of (RenderedPDF, cache status: MISS or COALESCED)
+    """
+    rendered, coalesced = await render_flight.do(
+        cache_key, lambda: render_to_cache(request, cache_key)
+    )
+    return rendered, "COALESCED" if coalesced else "MISS"
+
+class _ZipStream:
+    """Write-only, unseekable sink that zipfile writes into and we drain"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def _archive_name(index: int, filename: str) -> str:
+    return f"{index + 1:03d}-{filename}"
+
+async def stream_batch_zip(items: List[DocumentRequest]) -> AsyncIterator[bytes]:
+    """
+    Render a batch of requests and stream the results as a ZIP archive
+
+    All cache keys are looked up in one bulk operation. Misses render in
+    parallel, bounded by BATCH_CONCURRENCY, and each PDF is written to the
+    archive as soon as it is ready. Per-item outcomes, including failures,
+    are recorded in a trailing manifest.json.
+
+    Args:
+        items: Validated PDF or resume requests
+
+    Yields:
+        Chunks of the ZIP archive
+    """
+    start_time = time.time()
+    # Batch items queue behind interactive and preview renders
+    render_lane.set(BATCH)
+    sink = _ZipStream()
+    archive = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED)
+    manifest: List[Dict[str, Any]] = [{} for _ in items]
+
+    def add(index: int, pdf_bytes: bytes, cache_status: str) -> bytes:
+        name = _archive_name(index, items[index].filename)
+        archive.writestr(name, pdf_bytes)
+        metrics.count("/api/pdf/batch", cache_status.lower())
+        manifest[index] = {
+            "index": index,
+            "filename": name,
+            "status": "ok",
+            "cache": cache_status,
+            "size": len(pdf_bytes),
+        }
+        return sink.drain()
+
+    keys = [document_cache_key(item) for item in items]
+    cached = await get_cached_pdfs(keys)
+
+    # Items sharing a key (same payload and options) render once
+    pending: Dict[str, List[int]] = {}
+    for index, key in enumerate(keys):
+        if key in cached:
+            yield add(index, cached[key], "HIT")
+        else:
+            pending.setdefault(key, []).append(index)
+
+    semaphore = asyncio.Semaphore(settings.batch_concurrency)
+
+    async def render(key: str) -> Tuple[str, Optional[bytes], Union[str, Exception]]:
+        async with semaphore:
+            try:
+                rendered, cache_status = await render_once(items[pending[key][0]], key)
+                return key, rendered.pdf_bytes, cache_status
+            except Exception as e:
+                logger.warning(f"Batch render for key {key} failed: {str(e)}")
+                return key, None, e
+
+    tasks = [asyncio.ensure_future(render(key)) for key in pending]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            key, pdf_bytes, outcome = await next_done
+            for position, index in enumerate(pending[key]):
+                if pdf_bytes is not None:
+                    yield add(index, pdf_bytes, outcome if position == 0 else "COALESCED")
+                else:
+                    metrics.count("/api/pdf/batch", "timeout" if isinstance(outcome, RenderTimeoutError) else "error")
+                    manifest[index] = {
+                        "index": index,
+                        "filename": _archive_name(index, items[index].filename),
+                        "status": "error",
+                        "error": f"{type(outcome).__name__}: {outcome}",
+                    }
+    finally:
+        # Client went away: stop rendering what nobody will receive
+        for task in tasks:
+            task.cancel()
+
+    archive.writestr("manifest.json", json.dumps({
+        "items": manifest,
+        "succeeded": sum(entry["status"] == "ok" for entry in manifest),
+        "failed": sum(entry["status"] == "error" for entry in manifest),
+        "elapsed": round(time.time() - start_time, 3),
+    }, indent=2))
+    archive.close()
+    yield sink.drain()
@@ -0,0 +1,377 @@
+"""
+Asynchronous render jobs.
+
+A job is submitted, rendered by a worker, and its PDF collected later, so
+request latency no longer depends on render time. Jobs live in a backend:
+Redis for production, where any number of worker processes (worker.py) can
+consume the shared queue, or memory for tests and single-process setups.
+"""
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+import redis.asyncio as redis
+from pydantic import TypeAdapter
+from config import settings
+from services import codec, redis_client
+from services.cache import get_cached_pdf
+from services.documents import DocumentRequest, document_cache_key, render_once
+from services.pdf_generator import BATCH, RenderQueueFullError, RenderTimeoutError, render_lane
+
+logger = logging.getLogger("pdf-service")
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_request_adapter = TypeAdapter(DocumentRequest)
+
+def _new_job(request: DocumentRequest) -> Dict[str, Any]:
+    now = time.time()
+    return {
+        "id": uuid.uuid4().hex,
+        "status": QUEUED,
+        "stage": "queued",
+        "progress": 0.0,
+        "filename": request.filename,
+        "cache_key": document_cache_key(request),
+        "created_at": now,
+        "updated_at": now,
+        "error": None,
+        "request": request.model_dump_json(),
+    }
+
+def _public_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in job.items() if k != "request"}
+
+class MemoryJobBackend:
+    """
+    In-process job store and queue, for tests and single-process setups
+
+    Jobs and their results are dropped JOB_TTL seconds after their last
+    update, as in Redis.
+    """
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._results: Dict[str, bytes] = {}
+        self._queue: Optional[asyncio.Queue] = None
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        return self._queue
+
+    def _prune(self) -> None:
+        # Match Redis, where each write restarts a job's JOB_TTL
+        cutoff = time.time() - settings.job_ttl
+        for job_id in [i for i, job in self._jobs.items() if job["updated_at"] < cutoff]:
+            del self._jobs[job_id]
+            self._results.pop(job_id, None)
+
+    async def enqueue(self, job: Dict[str, Any]) -> None:
+        self._prune()
+        self._jobs[job["id"]] = job
+        await self.queue.put(job["id"])
+
+    async def dequeue(self, timeout: float) -> Optional[Dict[str, Any]]:
+        # asyncio.timeout, unlike wait_for on 3.11, never swallows a cancel
+        # that races a put()
+        try:
+            async with asyncio.timeout(timeout):
+                job_id = await self.queue.get()
+        except TimeoutError:
+            return None
+        return self._jobs.get(job_id)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        self._prune()
+        job = self._jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    async def update(self, job_id: str, **fields: Any) -> None:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            job.update(fields, updated_at=time.time())
+
+    async def store_result(self, job_id: str, pdf_bytes: bytes) -> None:
+        if job_id in self._jobs:
+            self._results[job_id] = pdf_bytes
+
+    async def get_result(self, job_id: str) -> Optional[bytes]:
+        return self._results.get(job_id)
+
+    async def ack(self, job_id: str) -> None:
+        pass
+
+    async def requeue_stale(self, max_age: float) -> int:
+        # Claimed jobs die with this process, so none can outlive their worker
+        return 0
+
+    async def queue_depth(self) -> int:
+        return self.queue.qsize()
+
+    async def close(self) -> None:
+        pass
+
+class RedisJobBackend:
+    """
+    Job store and queue in Redis, shared by every API and worker process
+
+    A worker claims a job by moving its id from the queue to a processing
+    list, and removes it from there only once the job is finished or handed
+    back. If the worker dies in between, the id stays in the processing list
+    and another worker requeues it once the job has made no progress for
+    JOB_STALE_SECONDS.
+    """
+
+    _QUEUE = "pdfjobs:queue"
+    _PROCESSING = "pdfjobs:processing"
+
+    def __init__(self):
+        self._blocking: Optional[redis.Redis] = None
+
+    @staticmethod
+    def _key(job_id: str) -> str:
+        return f"pdfjob:{job_id}"
+
+    def _blocking_client(self) -> redis.Redis:
+        # BLMOVE waits longer than the shared client's per-operation timeout
+        if self._blocking is None:
+            self._blocking = redis.from_url(
+                settings.redis_url,
+                db=settings.redis_db,
+                password=settings.redis_password or None,
+                socket_connect_timeout=settings.redis_connect_timeout,
+            )
+        return self._blocking
+
+    async def enqueue(self, job: Dict[str, Any]) -> None:
+        key = self._key(job["id"])
+
+        async def push(r: redis.Redis):
+            async with r.pipeline(transaction=True) as pipe:
+                pipe.set(key, json.dumps(job), ex=settings.job_ttl)
+                pipe.lpush(self._QUEUE, job["id"])
+                return await pipe.execute()
+
+        await redis_client.execute(push)
+
+    async def dequeue(self, timeout: float) -> Optional[Dict[str, Any]]:
+        claimed = await self._blocking_client().blmove(
+            self._QUEUE, self._PROCESSING, max(1, int(timeout)), "RIGHT", "LEFT"
+        )
+        if claimed is None:
+            return None
+        job_id = claimed.decode()
+        job = await self.get(job_id)
+        if job is None:
+            # Expired while queued
+            await self.ack(job_id)
+            return None
+        # Restart the stale clock, which otherwise counts the time spent queued
+        await self.update(job_id)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raw = await redis_client.execute(lambda r: r.get(self._key(job_id)))
+        return json.loads(raw) if raw else None
+
+    async def update(self, job_id: str, **fields: Any) -> None:
+        job = await self.get(job_id)
+        if job is None:
+            return
+        job.update(fields, updated_at=time.time())
+        await redis_client.execute(
+            lambda r: r.set(self._key(job_id), json.dumps(job), ex=settings.job_ttl)
+        )
+
+    async def store_result(self, job_id: str, pdf_bytes: bytes) -> None:
+        frame = codec.encode_entry(
+            pdf_bytes,
+            None,
+            level=settings.cache_compression_level,
+            min_saving=settings.cache_compression_min_saving,
+        )
+        await redis_client.execute(
+            lambda r: r.set(f"{self._key(job_id)}:result", frame, ex=settings.job_ttl)
+        )
+
+    async def get_result(self, job_id: str) -> Optional[bytes]:
+        frame = await redis_client.execute(lambda r: r.get(f"{self._key(job_id)}:result"))
+        return codec.decode_entry(frame).pdf_bytes if frame else None
+
+    async def ack(self, job_id: str) -> None:
+        """Release a claimed job once it is finished or back in the queue"""
+        # One entry only: a requeued job may already be claimed again by another worker
+        await redis_client.execute(lambda r: r.lrem(self._PROCESSING, 1, job_id))
+
+    async def requeue_stale(self, max_age: float) -> int:
+        """
+        Requeue claimed jobs that have made no progress for max_age seconds
+
+        Returns:
+            Number of jobs requeued
+        """
+        claimed = await redis_client.execute(lambda r: r.lrange(self._PROCESSING, 0, -1))
+        requeued = 0
+        for raw_id in claimed:
+            job_id = raw_id.decode()
+            job = await self.get(job_id)
+            if job is not None and time.time() - job["updated_at"] < max_age:
+                continue
+            # Only the worker whose LREM removes the id requeues it
+            removed = await redis_client.execute(lambda r: r.lrem(self._PROCESSING, 1, job_id))
+            if not removed or job is None:
+                continue
+            logger.warning(f"Requeuing render job {job_id}: no progress for {max_age:g}s")
+            job.update(status=QUEUED, stage="queued", progress=0.0, updated_at=time.time())
+            await self.enqueue(job)
+            requeued += 1
+        return requeued
+
+    async def queue_depth(self) -> int:
+        return await redis_client.execute(lambda r: r.llen(self._QUEUE))
+
+    async def close(self) -> None:
+        if self._blocking is not None:
+            close = getattr(self._blocking, "aclose", None) or self._blocking.close
+            await close()
+            self._blocking = None
+
+_backend = None
+
+def get_job_backend():
+    """Get or create the job backend selected by JOB_BACKEND"""
+    global _backend
+    if _backend is None:
+        if settings.job_backend == "memory":
+            _backend = MemoryJobBackend()
+        else:
+            _backend = RedisJobBackend()
+        logger.info(f"Using {settings.job_backend} job backend")
+    return _backend
+
+async def submit_job(request: DocumentRequest) -> Dict[str, Any]:
+    """
+    Queue a render job
+
+    Args:
+        request: Validated PDF or resume request
+
+    Returns:
+        Public view of the queued job
+    """
+    job = _new_job(request)
+    await get_job_backend().enqueue(job)
+    logger.info(f"Queued render job {job['id']}")
+    return _public_view(job)
+
+async def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Get the public view of a job, or None if it is unknown or expired"""
+    job = await get_job_backend().get(job_id)
+    return _public_view(job) if job is not None else None
+
+async def get_job_result(job: Dict[str, Any]) -> Optional[bytes]:
+    """Get the PDF of a finished job, from its result or from the PDF cache"""
+    try:
+        pdf_bytes = await get_job_backend().get_result(job["id"])
+    except Exception as e:
+        logger.warning(f"Error reading result of job {job['id']}: {str(e)}")
+        pdf_bytes = None
+    if pdf_bytes is None:
+        pdf_bytes = await get_cached_pdf(job["cache_key"])
+    return pdf_bytes
+
+async def _run_job(backend, job: Dict[str, Any]) -> None:
+    job_id = job["id"]
+    start_time = time.time()
+    try:
+        request = _request_adapter.validate_json(job["request"])
+        await backend.update(job_id, status=RUNNING, stage="checking cache", progress=0.1)
+
+        pdf_bytes = await get_cached_pdf(job["cache_key"])
+        if pdf_bytes is None:
+            await backend.update(job_id, stage="rendering", progress=0.3)
+            rendered, _ = await render_once(request, job["cache_key"])
+            pdf_bytes = rendered.pdf_bytes
+
+        await backend.update(job_id, stage="storing result", progress=0.9)
+        await backend.store_result(job_id, pdf_bytes)
+        await backend.update(
+            job_id,
+            status=DONE,
+            stage="done",
+            progress=1.0,
+            size=len(pdf_bytes),
+            elapsed=round(time.time() - start_time, 3),
+        )
+        logger.info(f"Render job {job_id} finished in {time.time() - start_time:.2f}s")
+    except asyncio.CancelledError:
+        # Worker shutting down: hand the job back rather than lose it
+        job.update(status=QUEUED, stage="queued", progress=0.0)
+        await backend.enqueue(job)
+        raise
+    except RenderQueueFullError as e:
+        # Render pool is saturated: requeue and back off instead of failing the job
+        logger.info(f"Render job {job_id} deferred for {e.retry_after}s: render queue is full")
+        job.update(status=QUEUED, stage="queued", progress=0.0)
+        await backend.enqueue(job)
+        await asyncio.sleep(e.retry_after)
+    except RenderTimeoutError as e:
+        if not e.running:
+            # Deadline passed while queued behind other work: try again later
+            logger.info(f"Render job {job_id} requeued: {str(e)}")
+            job.update(status=QUEUED, stage="queued", progress=0.0)
+            await backend.enqueue(job)
+            return
+        logger.warning(f"Render job {job_id} killed: {str(e)}")
+        await backend.update(job_id, status=FAILED, stage="timed out", error=str(e))
+    except Exception as e:
+        logger.exception(f"Render job {job_id} failed: {str(e)}")
+        await backend.update(job_id, status=FAILED, stage="failed", error=f"{type(e).__name__}: {e}")
+    finally:
+        # Finished, failed or handed back: release this worker's claim
+        try:
+            await backend.ack(job_id)
+        except Exception as e:
+            logger.warning(f"Error releasing render job {job_id}: {str(e)}")
+
+async def run_job_worker(backend=None, poll_timeout: float = 5.0) -> None:
+    """
+    Consume and render queued jobs until cancelled
+
+    Args:
+        backend: Job backend; defaults to the configured one
+        poll_timeout: Seconds to block waiting for the next job
+    """
+    backend = backend or get_job_backend()
+    # Nobody is waiting on the response, so jobs yield to interactive renders
+    render_lane.set(BATCH)
+    next_recovery = 0.0
+    while True:
+        if time.monotonic() >= next_recovery:
+            # Pick up jobs claimed by workers that died mid-render
+            next_recovery = time.monotonic() + settings.job_stale_seconds / 2
+            try:
+                await backend.requeue_stale(settings.job_stale_seconds)
+            except Exception as e:
+                logger.warning(f"Error requeuing stale jobs: {str(e)}")
+        try:
+            job = await backend.dequeue(poll_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Error reading job queue: {str(e)}")
+            await asyncio.sleep(poll_timeout)
+            continue
+        if job is not None:
+            await _run_job(backend, job)
+
+def start_job_workers(count: int) -> List[asyncio.Task]:
+    """Start job consumers in the current event loop"""
+    return [asyncio.create_task(run_job_worker()) for _ in range(count)]
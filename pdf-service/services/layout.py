@@ -0,0 +1,74 @@
+"""
+Layout-only checks for resumes.
+
+The admin preview needs to know whether a resume still fits its page budget
+and where sections break, not the PDF itself. Layouts run WeasyPrint's
+render() step without serializing a PDF, and the resulting report is cached
+like a PDF, keyed by resume content, theme and page options. The laid-out
+document itself stays in the render worker, so exporting the PDF afterwards
+skips layout.
+"""
+import json
+import logging
+from typing import Any, Dict, Tuple
+from models import ResumeLayoutRequest
+from services import metrics
+from services.cache import cache_pdf, get_cached_pdf
+from services.cache_keys import layout_cache_key
+from services.documents import layout_key, render_flight
+from services.pdf_generator import layout_from_html
+from services.resume_template import render_resume
+
+logger = logging.getLogger("pdf-service")
+
+def resume_layout_key(request: ResumeLayoutRequest) -> str:
+    """Build the cache key for a layout request; max_pages is not part of it"""
+    return layout_cache_key(
+        request.resume_data, request.theme, page_size=request.page_size, margin=request.margin
+    )
+
+async def _layout_to_cache(request: ResumeLayoutRequest, cache_key: str) -> Dict[str, Any]:
+    resume = render_resume(request.resume_data, request.theme)
+    metrics.observe("html_generation", resume.render_time)
+    layout = await layout_from_html(
+        resume.html,
+        page_size=request.page_size,
+        margin=request.margin,
+        stylesheets=resume.stylesheets,
+        layout_key=layout_key(request),
+        timeout=request.timeout,
+        quality=request.quality
+    )
+    await cache_pdf(cache_key, json.dumps(layout).encode(), {"kind": "layout"})
+    return layout
+
+def _check_budget(layout: Dict[str, Any], max_pages: int) -> Dict[str, Any]:
+    report = {**layout, "max_pages": max_pages, "fits": layout["page_count"] <= max_pages}
+    if not report["fits"]:
+        over = [s["name"] for s in layout["sections"] if s["end_page"] > max_pages]
+        report["warnings"] = [
+            f"Resume runs to {layout['page_count']} pages; the budget is {max_pages}"
+            + (f" (past the budget: {', '.join(over)})" if over else ""),
+            *layout["warnings"],
+        ]
+    return report
+
+async def resume_layout(request: ResumeLayoutRequest) -> Tuple[Dict[str, Any], str]:
+    """
+    Lay out a resume and check it against its page budget
+
+    Args:
+        request: Resume, theme, page options and page budget
+
+    Returns:
+        Tuple of (layout report, cache status: HIT, MISS or COALESCED)
+    """
+    cache_key = resume_layout_key(request)
+    cached = await get_cached_pdf(cache_key)
+    if cached:
+        return _check_budget(json.loads(cached), request.max_pages), "HIT"
+
+    layout, coalesced = await render_flight.do(
+        cache_key, lambda: _layout_to_cache(request, cache_key)
+    )
+    return _check_budget(layout, request.max_pages), "COALESCED" if coalesced else "MISS"
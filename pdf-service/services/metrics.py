@@ -0,0 +1,170 @@
+"""
+Prometheus metrics for the PDF service.
+
+Stage latencies are kept in fixed-bucket histograms and request outcomes in
+counters. Both are plain in-process counts updated from the event loop
+thread, so recording a sample is a bisect and two additions, with no locks
+and no formatting; the text exposition is built only when /metrics is
+scraped. Gauges are read from their sources at scrape time.
+
+Each API process keeps its own metrics; with several uvicorn workers, scrape
+each process or run one worker per container.
+"""
+import functools
+import inspect
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Upper bounds in seconds, from cache lookups to long renders
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Stages of a request, in the order they happen
+STAGES = (
+    "request_parse",    # receiving and validating the request body
+    "html_generation",  # templating resume data to HTML
+    "cache_key",        # hashing the request into its cache key
+    "cache_get",        # L1 and Redis lookup, including decompression
+    "cache_set",        # L1 and Redis store, including compression
+    "layout",           # WeasyPrint parse, style and layout in a worker
+    "pdf_serialize",    # WeasyPrint write_pdf in a worker
+    "response_send",    # first to last byte of the response
+)
+
+class Histogram:
+    """Fixed-bucket histogram of durations in seconds"""
+
+    __slots__ = ("counts", "sum")
+
+    def __init__(self):
+        # One slot per bucket plus +Inf; cumulated only when rendered
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+
+_stages: Dict[str, Histogram] = {stage: Histogram() for stage in STAGES}
+_outcomes: Dict[Tuple[str, str], int] = {}
+_gauges: Dict[str, Tuple[str, Callable[[], Any], Optional[str]]] = {}
+
+def observe(stage: str, seconds: float) -> None:
+    """Record the duration of a stage"""
+    _stages[stage].observe(seconds)
+
+def timed(stage: str) -> Callable:
+    """Decorator recording each call of a function, sync or async, as a stage sample"""
+    histogram = _stages[stage]
+
+    def decorator(fn: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - start)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+def count(endpoint: str, outcome: str) -> None:
+    """
+    Count a request outcome
+
+    Args:
+        endpoint: Route path, e.g. /api/pdf
+        outcome: hit, miss, coalesced, not_modified, rejected, cancelled, timeout or error
+    """
+    key = (endpoint, outcome)
+    _outcomes[key] = _outcomes.get(key, 0) + 1
+
+def register_gauge(name: str, help_text: str, read: Callable[[], Any], label: Optional[str] = None) -> None:
+    """
+    Register a gauge whose value is read when metrics are scraped
+
+    Args:
+        name: Metric name
+        help_text: Description for the HELP line
+        read: Returns the value, or with a label a mapping of label value to value
+        label: Label name the mapping's keys are exported under
+    """
+    _gauges[name] = (help_text, read, label)
+
+def request_parsed(scope: dict) -> None:
+    """Record request_parse for a request, called when its handler starts"""
+    started = scope.get("metrics_start")
+    if started is not None:
+        observe("request_parse", time.perf_counter() - started)
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def render_metrics() -> str:
+    """Metrics in the Prometheus text exposition format"""
+    lines: List[str] = [
+        "# HELP pdf_stage_duration_seconds Time spent in each stage of serving a PDF",
+        "# TYPE pdf_stage_duration_seconds histogram",
+    ]
+    for stage, histogram in _stages.items():
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKETS + ("+Inf",), histogram.counts):
+            cumulative += bucket_count
+            lines.append(f'pdf_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        lines.append(f'pdf_stage_duration_seconds_sum{{stage="{stage}"}} {_format_value(histogram.sum)}')
+        lines.append(f'pdf_stage_duration_seconds_count{{stage="{stage}"}} {cumulative}')
+
+    lines += [
+        "# HELP pdf_requests_total Requests by endpoint and cache outcome",
+        "# TYPE pdf_requests_total counter",
+    ]
+    for (endpoint, outcome), total in sorted(_outcomes.items()):
+        lines.append(f'pdf_requests_total{{endpoint="{endpoint}",outcome="{outcome}"}} {total}')
+
+    for name, (help_text, read, label) in _gauges.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        if label is None:
+            lines.append(f"{name} {_format_value(read())}")
+        else:
+            lines += [f'{name}{{{label}="{key}"}} {_format_value(value)}' for key, value in read().items()]
+    return "\n".join(lines) + "\n"
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing request parsing and response sending
+
+    Stamps the request start into the scope for request_parsed() and times
+    the response from its start message to its final body chunk. Only paths
+    under /api/ are timed.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+
+        scope["metrics_start"] = time.perf_counter()
+        response_start = 0.0
+
+        async def timed_send(message):
+            nonlocal response_start
+            if message["type"] == "http.response.start":
+                response_start = time.perf_counter()
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                observe("response_send", time.perf_counter() - response_start)
+
+        await self.app(scope, receive, timed_send)
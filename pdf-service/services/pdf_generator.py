@@ -1,75 +1,663 @@
+import copy
+import hashlib
+import io
 import logging
-import asyncio
-from concurrent.futures import ThreadPoolExecutor
-from weasyprint import HTML, CSS
-from weasyprint.text.fonts import FontConfiguration
-from typing import Optional
-import tempfile
 import os
+import sys
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from config import settings
+from services import metrics
+from services.render_pool import (
+    BATCH, INTERACTIVE, LANES, PREVIEW, RenderPool, RenderQueueFullError, RenderTimeoutError
+)
+from services.sampler import StackSampler, current_profile
+
+# WeasyPrint is imported by the render workers only, so the API process starts
+# without paying for it
+if TYPE_CHECKING:
+    from weasyprint import CSS
+    from weasyprint.text.fonts import FontConfiguration
+    from services.url_fetcher import SandboxedURLFetcher
 
 logger = logging.getLogger("pdf-service")
 
-# Thread pool for CPU-bound operations
-_executor = ThreadPoolExecutor(max_workers=4)
+# Page sizes requests may ask for, and the margin they get by default
+PAGE_SIZES = ("A3", "A4", "A5", "Letter", "Legal")
+DEFAULT_MARGIN = "0.5in"
+
+class QualityProfile(NamedTuple):
+    """
+    WeasyPrint options behind a quality request option
+
+    Images are decoded and recompressed while the document is laid out, so
+    their options go to render(); fonts are handled by write_pdf(). Every
+    profile compresses the PDF's streams.
+    """
+    render_options: Dict[str, Any]
+    write_options: Dict[str, Any]
+
+QUALITY_PROFILES: Dict[str, QualityProfile] = {
+    # Reading on a screen: images recompressed and capped at 150 dpi
+    "screen": QualityProfile(
+        {"optimize_images": True, "jpeg_quality": 70, "dpi": 150},
+        {"full_fonts": False},
+    ),
+    # Printing: images recompressed at high JPEG quality and capped at 300 dpi
+    "print": QualityProfile(
+        {"optimize_images": True, "jpeg_quality": 90, "dpi": 300},
+        {"full_fonts": False},
+    ),
+    # Keeping: images as supplied and fonts embedded whole, so the PDF can be edited later
+    "archive": QualityProfile(
+        {"optimize_images": False, "jpeg_quality": None, "dpi": None},
+        {"full_fonts": True},
+    ),
+}
+DEFAULT_QUALITY = "print"
+
+class RenderedPDF(NamedTuple):
+    """A generated PDF with the facts collected while rendering it"""
+    pdf_bytes: bytes
+    page_count: int
+    render_time: float
+    layout_reused: bool = False
+    layout_bytes: int = 0
+    # Time in write_pdf: fonts subset or embedded, images and streams encoded.
+    # Image recompression happens during layout and is part of render_time.
+    optimize_time: float = 0.0
+
+# Process pool for CPU-bound operations, started on first use
+_pool: Optional[RenderPool] = None
+
+# Priority lane renders started in the current context queue in
+render_lane: ContextVar[str] = ContextVar("render_lane", default=INTERACTIVE)
+
+# Per-worker state, built once by _init_worker in each render process
+_font_config: Optional["FontConfiguration"] = None
+
+# Per-worker cache of parsed stylesheets, keyed by a hash of their source
+_stylesheets: "OrderedDict[str, CSS]" = OrderedDict()
+
+# Per-worker resource sandbox and PDF output buffer
+_url_fetcher: Optional["SandboxedURLFetcher"] = None
+_base_url: Optional[str] = None
+_output = io.BytesIO()
+
+# Per-worker cache of laid-out documents: layout key -> (Document, estimated bytes)
+_documents: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+
+# Seconds this worker spent in _init_worker
+_init_time = 0.0
+
+# Last document and asset cache reports from each worker, by pid
+_layout_reports: Dict[int, Dict[str, Any]] = {}
+_asset_reports: Dict[int, Dict[str, Any]] = {}
+
+metrics.register_gauge(
+    "pdf_render_queue_depth", "Renders waiting for a free render worker, by priority lane",
+    lambda: _pool.stats()["queued"] if _pool is not None else {lane: 0 for lane in LANES},
+    label="lane"
+)
+metrics.register_gauge(
+    "pdf_renders_in_flight", "Renders running in a render worker",
+    lambda: _pool.stats()["busy"] if _pool is not None else 0
+)
+
+def get_render_pool() -> RenderPool:
+    """Get or create the render worker pool"""
+    global _pool
+    if _pool is None:
+        _pool = RenderPool(
+            max_workers=settings.render_workers,
+            initializer=_init_worker,
+            max_renders_per_worker=settings.render_max_renders_per_worker,
+            max_rss_mb=settings.render_max_rss_mb,
+            start_method=settings.render_start_method,
+            lane_max_wait={
+                INTERACTIVE: settings.render_max_wait_interactive,
+                PREVIEW: settings.render_max_wait_preview,
+                BATCH: settings.render_max_wait_batch,
+            },
+            max_queued=settings.render_max_queued,
+            expected_task_seconds=settings.render_expected_seconds,
+        )
+    return _pool
+
+def shutdown_render_pool() -> None:
+    """Stop the render worker processes"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+def render_timeout(requested: Optional[float] = None) -> float:
+    """
+    Deadline of a render in seconds
+
+    Args:
+        requested: Timeout the request asked for; RENDER_TIMEOUT if None
+
+    Returns:
+        The requested or default timeout, capped at RENDER_MAX_TIMEOUT
+    """
+    return min(requested or settings.render_timeout, settings.render_max_timeout)
+
+def render_pool_stats() -> Optional[Dict[str, Any]]:
+    """Occupancy, lane queue depths and rejections of the render pool, None before it starts"""
+    return _pool.stats() if _pool is not None else None
+
+def layout_cache_stats() -> Dict[str, Any]:
+    """Laid-out documents cached by the live render workers"""
+    live = set(_pool.worker_pids()) if _pool is not None else set()
+    workers = {pid: report for pid, report in _layout_reports.items() if pid in live}
+    return {
+        "entries": sum(report["entries"] for report in workers.values()),
+        "bytes": sum(report["bytes"] for report in workers.values()),
+        "workers": workers,
+    }
+
+def asset_cache_stats() -> Dict[str, Any]:
+    """Images, fonts and stylesheets cached by the live render workers' URL fetchers"""
+    live = set(_pool.worker_pids()) if _pool is not None else set()
+    workers = {pid: report for pid, report in _asset_reports.items() if pid in live}
+    totals = {
+        name: sum(report[name] for report in workers.values())
+        for name in ("entries", "bytes", "hits", "misses")
+    }
+    return {**totals, "workers": workers}
 
 async def generate_pdf_from_html(
     html_content: str,
     page_size: str = "A4",
     margin: str = "0.5in",
-    font_config: Optional[FontConfiguration] = None
+    stylesheets: Sequence[str] = ()
 ) -> bytes:
     """
     Generate a PDF from HTML content using WeasyPrint with preserved styling
-    
+
+    Fonts are resolved by the render worker's long-lived FontConfiguration.
+
     Args:
         html_content: HTML content to convert to PDF
         page_size: Page size (A4, Letter, etc.)
         margin: Page margin
-        font_config: Font configuration for custom fonts
-        
+        stylesheets: CSS sources applied on top of the document's own styles
+
     Returns:
         PDF content as bytes
     """
+    rendered = await render_pdf_from_html(
+        html_content, page_size=page_size, margin=margin, stylesheets=stylesheets
+    )
+    return rendered.pdf_bytes
+
+async def render_pdf_from_html(
+    html_content: str,
+    page_size: str = "A4",
+    margin: str = "0.5in",
+    stylesheets: Sequence[str] = (),
+    layout_key: Optional[str] = None,
+    pages: Optional[str] = None,
+    metadata: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+    quality: str = DEFAULT_QUALITY
+) -> RenderedPDF:
+    """
+    Generate a PDF from HTML content and report its page count and render time
+
+    With a layout_key, the laid-out document is kept in the worker that
+    rendered it, and later requests for the same key, such as another page
+    range or different metadata, are sent to that worker and skip layout.
+
+    Args:
+        html_content: HTML content to convert to PDF
+        page_size: Page size (A4, Letter, etc.)
+        margin: Page margin
+        stylesheets: CSS sources applied on top of the document's own styles
+        layout_key: Key identifying the laid-out document (content and options)
+        pages: Page ranges to export, e.g. "1-2,4"; all pages if None
+        metadata: PDF title and author overrides
+        timeout: Requested deadline in seconds, see render_timeout()
+        quality: Name of the QUALITY_PROFILES entry to render with
+
+    Returns:
+        RenderedPDF with the PDF bytes and render facts
+    """
     try:
         logger.debug("Starting PDF generation")
-        
-        # Run the CPU-bound operation in a thread pool
-        loop = asyncio.get_running_loop()
-        pdf_bytes = await loop.run_in_executor(
-            _executor,
+
+        # Run the CPU-bound operation in a worker process
+        profile = current_profile.get()
+        pdf_bytes, page_count, render_time, layout = await get_render_pool().submit(
             _generate_pdf_sync,
-            html_content
+            html_content,
+            (*stylesheets, page_stylesheet(page_size, margin)),
+            layout_key,
+            pages,
+            metadata,
+            settings.profile_interval_ms / 1000 if profile is not None else None,
+            quality,
+            affinity=layout_key,
+            lane=render_lane.get(),
+            timeout=render_timeout(timeout)
+        )
+        _layout_reports[layout["pid"]] = layout["cache"]
+        _asset_reports[layout["pid"]] = layout["assets"]
+        if profile is not None:
+            profile.add(layout["profile"])
+        if not layout["reused"]:
+            metrics.observe("layout", layout["layout_time"])
+        metrics.observe("pdf_serialize", layout["write_time"])
+
+        logger.debug(
+            f"Generated {quality} PDF of size {len(pdf_bytes)} bytes, {page_count} pages in {render_time:.2f}s "
+            f"(layout {'reused' if layout['reused'] else 'built'}, ~{layout['bytes'] // 1024} KB, "
+            f"written in {layout['write_time']:.3f}s)"
+        )
+        return RenderedPDF(
+            pdf_bytes, page_count, render_time, layout["reused"], layout["bytes"], layout["write_time"]
         )
-        
-        logger.debug(f"Generated PDF of size {len(pdf_bytes)} bytes")
-        return pdf_bytes
-        
+
+    except (RenderQueueFullError, RenderTimeoutError) as e:
+        logger.warning(str(e))
+        raise
     except Exception as e:
         logger.exception(f"Error generating PDF: {str(e)}")
         raise
 
-def _generate_pdf_sync(html_content: str) -> bytes:
+async def layout_from_html(
+    html_content: str,
+    page_size: str = "A4",
+    margin: str = "0.5in",
+    stylesheets: Sequence[str] = (),
+    layout_key: Optional[str] = None,
+    timeout: Optional[float] = None,
+    quality: str = DEFAULT_QUALITY
+) -> Dict[str, Any]:
+    """
+    Lay out HTML content without producing a PDF
+
+    Runs WeasyPrint's render() step only, which is most of the work of a
+    render but skips PDF serialization, and reports where things landed.
+
+    Args:
+        html_content: HTML content to lay out
+        page_size: Page size (A4, Letter, etc.)
+        margin: Page margin
+        stylesheets: CSS sources applied on top of the document's own styles
+        layout_key: Key identifying the laid-out document, shared with renders
+        timeout: Requested deadline in seconds, see render_timeout()
+        quality: Quality profile, so a later render of this quality reuses the layout
+
+    Returns:
+        Dict with page_count, sections, warnings and layout_time
     """
-    Synchronous PDF generation function to run in thread pool
-    Convert HTML to PDF using WeasyPrint with preserved styling - matches reference implementation
+    layout = await get_render_pool().submit(
+        _layout_sync,
+        html_content,
+        (*stylesheets, page_stylesheet(page_size, margin)),
+        layout_key,
+        quality,
+        affinity=layout_key,
+        lane=render_lane.get(),
+        timeout=render_timeout(timeout)
+    )
+    worker = layout.pop("worker")
+    _layout_reports[worker["pid"]] = worker["cache"]
+    _asset_reports[worker["pid"]] = worker["assets"]
+    return layout
+
+async def check_renderer() -> List[Dict[str, Any]]:
+    """
+    Run a test render on every live render worker
+
+    Spawns the pool if needed and waits for each worker to finish warming up,
+    so no real request is the first to hit a cold worker.
+
+    Returns:
+        One report per worker with its pid, init time and test render time
+
+    Raises:
+        RenderTimeoutError: If the workers are not all done within RENDER_MAX_TIMEOUT
+        Exception: If a worker fails to render the test document
+    """
+    return await get_render_pool().run_on_each(_self_test_sync, timeout=settings.render_max_timeout)
+
+@lru_cache(maxsize=64)
+def page_stylesheet(page_size: str, margin: str) -> str:
     """
+    Build the stylesheet that applies the page size and margin render options
+
+    It is passed after any theme stylesheet, so it overrides the theme's
+    page rules, while an @page rule in a document's own styles still wins.
+    Each combination is built once here and parsed once per worker.
+
+    Args:
+        page_size: Page size (A4, Letter, etc.)
+        margin: Page margin
+
+    Returns:
+        CSS source
+    """
+    return f"@page {{ size: {page_size}; margin: {margin}; }}"
+
+def _init_worker() -> None:
+    """
+    Warm up a render worker process
+
+    Runs once per worker at spawn so the WeasyPrint import, fontconfig
+    setup and parsing of the theme and default page stylesheets are paid
+    before the first request instead of during it.
+    """
+    global _font_config, _url_fetcher, _base_url, _init_time
+    start_time = time.perf_counter()
+    from weasyprint.text.fonts import FontConfiguration
+    from services.url_fetcher import base_url, create_url_fetcher
+
+    logging.basicConfig(
+        level=getattr(logging, settings.log_level.upper(), logging.INFO),
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    _font_config = FontConfiguration()
+    _url_fetcher = create_url_fetcher()
+    _base_url = base_url()
+
+    from services.resume_template import available_themes, get_theme
+    for name in available_themes():
+        _get_stylesheet(get_theme(name).stylesheet)
+    for page_size in PAGE_SIZES:
+        _get_stylesheet(page_stylesheet(page_size, DEFAULT_MARGIN))
+    _init_time = time.perf_counter() - start_time
+    logger.info(
+        f"Render worker {os.getpid()} ready in {_init_time:.2f}s ({len(_stylesheets)} stylesheets parsed)"
+    )
+
+def _get_stylesheet(source: str) -> "CSS":
+    """
+    Get a parsed stylesheet from the worker's cache, parsing it on a miss
+
+    Parsed CSS objects are reusable across renders that share the worker's
+    FontConfiguration, so each distinct stylesheet is parsed once per worker.
+    """
+    key = hashlib.sha256(source.encode()).hexdigest()
+    stylesheet = _stylesheets.get(key)
+    if stylesheet is not None:
+        _stylesheets.move_to_end(key)
+        return stylesheet
+
+    from weasyprint import CSS
+
+    stylesheet = CSS(string=source, font_config=_font_config, url_fetcher=_url_fetcher, base_url=_base_url)
+    _stylesheets[key] = stylesheet
+    if len(_stylesheets) > settings.render_stylesheet_cache_size:
+        _stylesheets.popitem(last=False)
+    return stylesheet
+
+def _render_document(html_content: str, stylesheets: Tuple[str, ...], quality: str = DEFAULT_QUALITY):
+    """Parse, style and lay out a document from its source string"""
+    from weasyprint import HTML
+
+    return HTML(
+        string=html_content,
+        base_url=_base_url,
+        url_fetcher=_url_fetcher
+    ).render(
+        stylesheets=[_get_stylesheet(css) for css in stylesheets],
+        font_config=_font_config,
+        **QUALITY_PROFILES[quality].render_options
+    )
+
+def _estimate_document_bytes(document) -> int:
+    """
+    Estimate the memory held by a laid-out document
+
+    Sums the Python objects of its box tree and their text; computed styles
+    shared between boxes and native Pango memory are not counted.
+    """
+    total = 0
+    stack = [page._page_box for page in document.pages]
+    while stack:
+        box = stack.pop()
+        total += sys.getsizeof(box) + sys.getsizeof(box.__dict__)
+        text = getattr(box, "text", None)
+        if text:
+            total += sys.getsizeof(text)
+        stack.extend(box.all_children())
+    return total
+
+def _get_document(
+    html_content: str,
+    stylesheets: Tuple[str, ...],
+    layout_key: Optional[str],
+    quality: str = DEFAULT_QUALITY
+):
+    """
+    Get a laid-out document from the worker's cache, laying it out on a miss
+
+    The layout key must cover the quality, since images are prepared for it
+    during layout.
+
+    Returns:
+        Tuple of (Document, estimated bytes, whether it was reused)
+    """
+    if layout_key is not None and layout_key in _documents:
+        _documents.move_to_end(layout_key)
+        document, size = _documents[layout_key]
+        return document, size, True
+
+    document = _render_document(html_content, stylesheets, quality)
+    size = _estimate_document_bytes(document)
+    max_bytes = settings.render_document_cache_max_mb * 1024 * 1024
+    if layout_key is not None and settings.render_document_cache_size > 0 and size <= max_bytes:
+        _documents[layout_key] = (document, size)
+        while (
+            len(_documents) > settings.render_document_cache_size
+            or sum(entry[1] for entry in _documents.values()) > max_bytes
+        ):
+            _documents.popitem(last=False)
+    return document, size, False
+
+def _document_cache_report() -> Dict[str, Any]:
+    return {
+        "entries": len(_documents),
+        "bytes": sum(size for _, size in _documents.values()),
+        "layouts": [{"key": key, "bytes": size} for key, (_, size) in _documents.items()],
+    }
+
+def _parse_pages(pages: str, page_count: int) -> List[int]:
+    """Turn page ranges like "1-2,4,6-" into zero-based page indexes"""
+    indexes: List[int] = []
+    for part in pages.split(","):
+        first, dash, last = part.partition("-")
+        start = int(first)
+        end = int(last) if last else (page_count if dash else start)
+        if start < 1 or end < start:
+            raise ValueError(f"Invalid page range {part}")
+        for number in range(start, min(end, page_count) + 1):
+            if number - 1 not in indexes:
+                indexes.append(number - 1)
+    if not indexes:
+        raise ValueError(f"Pages {pages} not in document of {page_count} pages")
+    return indexes
+
+def _select_variant(document, pages: Optional[str], metadata: Optional[Dict[str, str]]):
+    """Derive a page selection and/or metadata variant without touching the cached document"""
+    if not pages and not metadata:
+        return document
+    variant = document.copy(
+        [document.pages[i] for i in _parse_pages(pages, len(document.pages))] if pages else "all"
+    )
+    if metadata:
+        variant.metadata = copy.copy(document.metadata)
+        if metadata.get("title"):
+            variant.metadata.title = metadata["title"]
+        if metadata.get("author"):
+            variant.metadata.authors = [metadata["author"]]
+    return variant
+
+def _generate_pdf_sync(
+    html_content: str,
+    stylesheets: Tuple[str, ...] = (),
+    layout_key: Optional[str] = None,
+    pages: Optional[str] = None,
+    metadata: Optional[Dict[str, str]] = None,
+    profile_interval: Optional[float] = None,
+    quality: str = DEFAULT_QUALITY
+) -> Tuple[bytes, int, float, Dict[str, Any]]:
+    """
+    Synchronous PDF generation function to run in a render worker
+
+    Renders straight from the string, resolving resources through the
+    sandboxed fetcher, and writes the PDF into the worker's reusable buffer,
+    so nothing touches the filesystem. With a profile_interval, the render
+    is sampled and its folded stacks returned with the layout facts. The
+    quality names the QUALITY_PROFILES entry applied to images and fonts.
+
+    Returns:
+        Tuple of (PDF bytes, page count, render time in seconds, layout facts)
+    """
+    sampler = None
+    if profile_interval is not None:
+        sampler = StackSampler(f"render-worker-{os.getpid()}", profile_interval).start()
     try:
-        # Create temporary file to match reference implementation approach
-        import tempfile
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False) as temp_file:
-            temp_file.write(html_content)
-            temp_file.flush()
-            
-            # Convert HTML file to PDF with embedded CSS (like reference)
-            html_doc = HTML(temp_file.name)
-            pdf_bytes = html_doc.write_pdf()
-            
-            # Clean up temp file
-            os.unlink(temp_file.name)
-        
+        start_time = time.perf_counter()
+
+        document, size, reused = _get_document(html_content, stylesheets, layout_key, quality)
+        document = _select_variant(document, pages, metadata)
+        laid_out = time.perf_counter()
+
+        _output.seek(0)
+        _output.truncate()
+        document.write_pdf(target=_output, **QUALITY_PROFILES[quality].write_options)
+        pdf_bytes = _output.getvalue()
+        written = time.perf_counter()
+
         logger.debug(f"Successfully generated PDF of {len(pdf_bytes)} bytes")
-        return pdf_bytes
-        
+        layout = {
+            "pid": os.getpid(),
+            "reused": reused,
+            "bytes": size,
+            "cache": _document_cache_report(),
+            "assets": _url_fetcher.cache.stats(),
+            "layout_time": laid_out - start_time,
+            "write_time": written - laid_out,
+        }
+        if sampler is not None:
+            layout["profile"] = sampler.stop()
+        return pdf_bytes, len(document.pages), written - start_time, layout
+
     except Exception as e:
         logger.exception(f"Error in synchronous PDF generation: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+    finally:
+        if sampler is not None:
+            sampler.stop()
+
+def _layout_sync(
+    html_content: str,
+    stylesheets: Tuple[str, ...] = (),
+    layout_key: Optional[str] = None,
+    quality: str = DEFAULT_QUALITY
+) -> Dict[str, Any]:
+    """
+    Synchronous layout function to run in a render worker
+
+    Returns:
+        Dict with page_count, sections, warnings and layout_time, plus the
+        worker's cache reports under "worker"
+    """
+    start_time = time.perf_counter()
+    document, _, _ = _get_document(html_content, stylesheets, layout_key, quality)
+    layout = _describe_layout(document)
+    layout["layout_time"] = round(time.perf_counter() - start_time, 4)
+    layout["worker"] = {
+        "pid": os.getpid(),
+        "cache": _document_cache_report(),
+        "assets": _url_fetcher.cache.stats(),
+    }
+    return layout
+
+def _self_test_sync() -> Dict[str, Any]:
+    """Render a small document in a render worker and report on the worker"""
+    if _font_config is None:
+        raise RuntimeError(f"Render worker {os.getpid()} has no font configuration")
+    start_time = time.perf_counter()
+    document = _render_document(
+        "<html><body><h1>Ready</h1><p>Render self-test</p></body></html>",
+        (page_stylesheet("A4", DEFAULT_MARGIN),)
+    )
+    pdf_bytes = document.write_pdf()
+    if not pdf_bytes.startswith(b"%PDF") or not document.pages:
+        raise RuntimeError(f"Render worker {os.getpid()} produced an invalid test PDF")
+    return {
+        "pid": os.getpid(),
+        "init_time": round(_init_time, 3),
+        "render_time": round(time.perf_counter() - start_time, 3),
+    }
+
+def _box_label(box) -> str:
+    text = " ".join("".join(box.element.itertext()).split())
+    return f"<{box.element_tag}> {text[:40]}".rstrip()
+
+def _describe_layout(document) -> Dict[str, Any]:
+    """
+    Summarize where a laid-out document's sections and entries fell
+
+    Sections and entries are the elements marked with data-section and
+    data-entry attributes; an element split over pages has one box per page.
+
+    Returns:
+        Dict with page_count, per-section page positions and warnings
+    """
+    sections: Dict[str, Dict[str, Any]] = {}
+    entries: Dict[str, List[int]] = {}
+    warnings: List[str] = []
+
+    def visit(box, number: int, right_edge: float, inside_overflow: bool) -> None:
+        element = getattr(box, "element", None)
+        if element is not None and box.element_tag not in ("html", "body"):
+            name = element.get("data-section")
+            if name:
+                bottom = round(box.position_y + box.margin_height(), 1)
+                section = sections.setdefault(name, {
+                    "name": name,
+                    "start_page": number,
+                    "end_page": number,
+                    "top": round(box.position_y, 1),
+                    "bottom": bottom,
+                })
+                # Anonymous and text boxes carry their parent's element too
+                if section["end_page"] == number:
+                    bottom = max(bottom, section["bottom"])
+                section["end_page"] = number
+                section["bottom"] = bottom
+
+            entry = element.get("data-entry")
+            if entry is not None and number not in entries.setdefault(entry, []):
+                entries[entry].append(number)
+
+            # Report only the outermost box that overflows, not its contents
+            if not inside_overflow and box.position_x + box.margin_width() > right_edge + 0.5:
+                warnings.append(f"Content overflows the right margin on page {number}: {_box_label(box)}")
+                inside_overflow = True
+
+        for child in box.all_children():
+            visit(child, number, right_edge, inside_overflow)
+
+    for number, page in enumerate(document.pages, 1):
+        for root in page._page_box.all_children():
+            visit(root, number, root.position_x + root.width, False)
+
+    for entry, pages in entries.items():
+        if len(pages) > 1:
+            warnings.append(f"Entry '{entry}' is split across pages {pages[0]}-{pages[-1]}")
+
+    return {
+        "page_count": len(document.pages),
+        "sections": list(sections.values()),
+        "warnings": warnings,
+    }
@@ -0,0 +1,123 @@
+"""
+Opt-in per-request profiling.
+
+A request is profiled when it carries X-Profile-Token matching PROFILE_TOKEN,
+or is picked at random at PROFILE_SAMPLE_RATE. Profiles are only served to
+holders of the token, so without PROFILE_TOKEN nothing is profiled. While it runs, the event loop
+thread is sampled; if it renders, the render worker samples itself for the
+duration of the render and sends its stacks back with the PDF. The combined
+folded stacks are stored under the request's X-Request-ID, in Redis and in a
+small in-process buffer, for PROFILE_TTL seconds, and served by
+/debug/profiles/{request_id}. They are kept apart from the PDF cache.
+
+The event loop is shared, so its samples include whatever else ran at the
+same time; profile on a quiet instance for a clean picture. With profiling
+disabled the middleware is not installed and nothing is sampled.
+"""
+import logging
+import random
+import secrets
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional, Tuple
+from config import settings
+from services import redis_client
+from services.sampler import RequestProfile, StackSampler, current_profile
+
+logger = logging.getLogger("pdf-service")
+
+PROFILE_TOKEN_HEADER = "x-profile-token"
+
+# Profiles kept in-process, so they can be read back while Redis is unavailable
+_MAX_LOCAL_PROFILES = 32
+_local: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+
+def enabled() -> bool:
+    """Whether any request can be profiled"""
+    if not settings.profile_token:
+        if settings.profile_sample_rate > 0:
+            logger.warning("PROFILE_SAMPLE_RATE is set without PROFILE_TOKEN; profiling stays off")
+        return False
+    return True
+
+def token_matches(token: Optional[str]) -> bool:
+    """Check a client-supplied token against PROFILE_TOKEN"""
+    return bool(settings.profile_token and token) and secrets.compare_digest(token, settings.profile_token)
+
+def _profile_key(request_id: str) -> str:
+    return f"pdfprofile:{request_id}"
+
+async def store_profile(request_id: str, folded: str) -> None:
+    """Keep a request's folded stacks for PROFILE_TTL seconds"""
+    key = _profile_key(request_id)
+    data = folded.encode()
+    _local[key] = (data, time.monotonic() + settings.profile_ttl)
+    _local.move_to_end(key)
+    while len(_local) > _MAX_LOCAL_PROFILES:
+        _local.popitem(last=False)
+    try:
+        await redis_client.execute(lambda r: r.setex(key, settings.profile_ttl, data))
+    except Exception as e:
+        logger.warning(f"Error storing profile {request_id}: {str(e)}")
+
+async def load_profile(request_id: str) -> Optional[str]:
+    """Folded stacks stored for a request, or None if missing or expired"""
+    key = _profile_key(request_id)
+    entry = _local.get(key)
+    if entry is not None and entry[1] > time.monotonic():
+        return entry[0].decode()
+    try:
+        data = await redis_client.execute(lambda r: r.get(key))
+    except Exception as e:
+        logger.warning(f"Error reading profile {request_id}: {str(e)}")
+        return None
+    return data.decode() if data is not None else None
+
+def _header(scope, name: str) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name.encode():
+            return value.decode("latin-1")
+    return None
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling requests under /api/ that opt in or are sampled"""
+
+    def __init__(self, app):
+        self.app = app
+
+    def _wants_profile(self, scope) -> bool:
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            return False
+        if token_matches(_header(scope, PROFILE_TOKEN_HEADER)):
+            return True
+        return random.random() < settings.profile_sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if not self._wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        profile_id = str(uuid.uuid4())
+        token = current_profile.set(profile)
+        sampler = StackSampler("event-loop", settings.profile_interval_ms / 1000).start()
+
+        async def profiled_send(message):
+            nonlocal profile_id
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                request_id = next((v for k, v in headers if k.lower() == b"x-request-id"), None)
+                if request_id is not None:
+                    profile_id = request_id.decode("latin-1")
+                headers.append((b"x-profile-id", profile_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, profiled_send)
+        finally:
+            current_profile.reset(token)
+            profile.add(sampler.stop())
+            await store_profile(profile_id, profile.folded())
+            logger.info(f"Stored profile of {scope['path']} [ID: {profile_id}, samples: {sum(profile.samples.values())}]")
@@ -0,0 +1,105 @@
+"""
+Startup readiness for the /ready probe.
+
+/health only says the process is up. The service is ready once the render
+workers have started and loaded fonts, a test render has passed, Redis has
+answered a ping, and cache warm-up has reached its threshold. The checks run
+in the background after startup, so /health is served immediately, and the
+time each one took is logged and reported.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+from config import settings
+from services import redis_client
+from services.pdf_generator import check_renderer
+from services.warmup import progress as warmup_progress, start_warmup
+
+logger = logging.getLogger("pdf-service")
+
+# Seconds between attempts of a failing check
+RETRY_INTERVAL = 2.0
+
+class StartupState:
+    """Outcome and timing of the startup checks"""
+
+    def __init__(self):
+        self.import_time = 0.0
+        self.started_at: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self.ready_at: Optional[float] = None
+        self.checks: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_at is not None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "import_time": round(self.import_time, 3),
+            "time_to_checks": round(self.checked_at - self.started_at, 3) if self.checked_at else None,
+            "time_to_ready": round(self.ready_at - self.started_at, 3) if self.ready else None,
+            "checks": self.checks,
+            "warmup": warmup_progress.to_dict(),
+        }
+
+state = StartupState()
+
+async def _run_check(name: str, check, required: bool = True) -> None:
+    """Run a check until it passes, or once if it is not required"""
+    state.checks[name] = {"ok": False, "attempts": 0}
+    start_time = time.perf_counter()
+    while True:
+        state.checks[name]["attempts"] += 1
+        try:
+            detail = await check()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            state.checks[name]["error"] = str(e)
+            logger.warning(f"Readiness check {name} failed: {str(e)}")
+            if not required:
+                return
+            await asyncio.sleep(RETRY_INTERVAL)
+            continue
+        state.checks[name].update(ok=True, time=round(time.perf_counter() - start_time, 3), error=None)
+        if detail is not None:
+            state.checks[name]["detail"] = detail
+        return
+
+async def _check_redis() -> None:
+    await redis_client.execute(lambda r: r.ping())
+
+async def run_startup_checks() -> None:
+    """Run the startup checks, then cache warm-up, and log the time to ready"""
+    state.started_at = time.perf_counter()
+    await asyncio.gather(
+        _run_check("renderer", check_renderer),
+        _run_check("redis", _check_redis, required=settings.ready_require_redis),
+    )
+    state.checked_at = time.perf_counter()
+
+    # Warm-up renders through the workers and reads the cache, so it starts
+    # once both are known to work
+    warmup = start_warmup()
+    try:
+        await warmup_progress.wait_ready()
+        state.ready_at = time.perf_counter()
+        logger.info(
+            f"PDF service ready {state.ready_at - state.started_at:.2f}s after startup "
+            f"(imports {state.import_time:.2f}s, startup checks {state.checked_at - state.started_at:.2f}s, "
+            f"warm-up {state.ready_at - state.checked_at:.2f}s)"
+        )
+        if warmup is not None:
+            await warmup
+    finally:
+        if warmup is not None:
+            warmup.cancel()
+
+def start_readiness(import_time: float) -> asyncio.Task:
+    """Start the startup checks in the background"""
+    state.import_time = import_time
+    logger.info(f"Application modules imported in {import_time:.2f}s")
+    return asyncio.create_task(run_startup_checks())
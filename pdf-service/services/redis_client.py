@@ -0,0 +1,163 @@
+"""
+Shared Redis client with a bounded connection pool and a circuit breaker.
+
+Every operation runs under a short timeout. After repeated failures the
+breaker opens and operations fail immediately for a cool-down period, so a
+Redis outage costs requests nothing instead of a timeout each. The first
+call after the cool-down probes Redis and closes the breaker on success.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+from config import settings
+
+logger = logging.getLogger("pdf-service")
+
+T = TypeVar("T")
+
+class RedisUnavailableError(RuntimeError):
+    """Raised instead of calling Redis while the circuit breaker is open"""
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open circuit breaker
+
+    Args:
+        failure_threshold: Consecutive failures that open the breaker
+        reset_timeout: Seconds to stay open before letting a probe through
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.times_opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go to Redis now"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        if self._state != self.CLOSED:
+            logger.info("Redis circuit breaker closed")
+        self._state = self.CLOSED
+        self._failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        was_probe = self._probe_in_flight
+        self._probe_in_flight = False
+        if was_probe or (self._state == self.CLOSED and self._failures >= self.failure_threshold):
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+            self.times_opened += 1
+            logger.warning(
+                f"Redis circuit breaker opened after {self._failures} failures; "
+                f"skipping Redis for {self.reset_timeout:.0f}s"
+            )
+
+    def release_probe(self) -> None:
+        """Let another probe through after one ended without an outcome"""
+        self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state
+        return {
+            "state": state,
+            "consecutive_failures": self._failures,
+            "times_opened": self.times_opened,
+            "rejected_calls": self.rejected,
+            "retry_in": round(max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at)), 1)
+            if state == self.OPEN else 0.0,
+        }
+
+breaker = CircuitBreaker(
+    failure_threshold=settings.redis_breaker_failures,
+    reset_timeout=settings.redis_breaker_reset_seconds,
+)
+
+# Redis connection
+_redis: Optional[redis.Redis] = None
+
+def get_redis_connection() -> redis.Redis:
+    """Get or create the pooled Redis client"""
+    global _redis
+    if _redis is None:
+        pool = redis.ConnectionPool.from_url(
+            settings.redis_url,
+            db=settings.redis_db,
+            password=settings.redis_password or None,
+            max_connections=settings.redis_max_connections,
+            socket_timeout=settings.redis_socket_timeout,
+            socket_connect_timeout=settings.redis_connect_timeout,
+            health_check_interval=30,
+        )
+        _redis = redis.Redis(connection_pool=pool)
+        logger.info(f"Connected to Redis at {settings.redis_url} (pool of {settings.redis_max_connections})")
+    return _redis
+
+async def execute(operation: Callable[[redis.Redis], Awaitable[T]]) -> T:
+    """
+    Run a Redis operation through the circuit breaker
+
+    Args:
+        operation: Callable taking the client and returning an awaitable
+
+    Returns:
+        The operation's result
+
+    Raises:
+        RedisUnavailableError: If the breaker is open
+        RedisError, OSError, asyncio.TimeoutError: If the operation fails
+    """
+    if not breaker.allow():
+        raise RedisUnavailableError("Redis circuit breaker is open")
+    try:
+        result = await asyncio.wait_for(
+            operation(get_redis_connection()),
+            timeout=settings.redis_socket_timeout * 2,
+        )
+    except (RedisError, OSError, asyncio.TimeoutError):
+        breaker.record_failure()
+        raise
+    except BaseException:
+        # Cancelled or a caller bug; neither says anything about Redis health
+        breaker.release_probe()
+        raise
+    breaker.record_success()
+    return result
+
+async def close_redis_connection() -> None:
+    """Close the client and disconnect every pooled connection"""
+    global _redis
+    if _redis is not None:
+        client, _redis = _redis, None
+        close = getattr(client, "aclose", None) or client.close
+        await close()
+        await client.connection_pool.disconnect()
+        logger.info("Closed Redis connection pool")
@@ -0,0 +1,561 @@
+"""
+Process pool for CPU-bound PDF rendering.
+
+WeasyPrint layout is pure Python, so renders running on threads serialise on
+the GIL. Each worker here is a separate process that is warmed up once by an
+initializer and recycled after a number of renders or when its resident
+memory grows past a ceiling.
+
+Tasks may name an affinity key. A task is then preferably run on the worker
+that last ran a task with the same key, if it is idle, so per-worker caches
+keyed the same way get reused.
+
+Tasks waiting for a worker queue in priority lanes: a free worker goes to
+the oldest task of the highest lane that has one. Admission is bounded: a
+task whose estimated wait exceeds its lane's limit, or that would grow the
+queue past its cap, is rejected with RenderQueueFullError rather than queued.
+
+A task may carry a timeout covering both its wait and its run. A task still
+queued at its deadline, or whose caller is cancelled, leaves the queue; a
+task still running at its deadline has its worker killed and replaced, since
+a render stuck in layout cannot be interrupted any other way.
+"""
+import asyncio
+import logging
+import math
+import multiprocessing
+import os
+import resource
+import signal
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("pdf-service")
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+# Priority lanes, highest first
+INTERACTIVE = "interactive"
+PREVIEW = "preview"
+BATCH = "batch"
+LANES = (INTERACTIVE, PREVIEW, BATCH)
+
+
+class WorkerCrashedError(RuntimeError):
+    """Raised when a render worker exits while processing a task"""
+
+
+class RenderTimeoutError(RuntimeError):
+    """
+    Raised when a task does not finish within its timeout
+
+    Args:
+        timeout: Seconds the task was allowed
+        running: Whether it had started, and its worker was killed
+    """
+
+    def __init__(self, timeout: float, running: bool):
+        state = "running" if running else "queued"
+        super().__init__(f"Render still {state} after its {timeout:g}s deadline")
+        self.timeout = timeout
+        self.running = running
+
+
+class RenderQueueFullError(RuntimeError):
+    """
+    Raised when a task is refused admission to the render queue
+
+    Args:
+        lane: Lane the task asked for
+        retry_after: Seconds after which the queue is expected to have room
+    """
+
+    def __init__(self, lane: str, retry_after: int):
+        super().__init__(f"Render queue is full for {lane} work; retry in {retry_after}s")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+def _current_rss_mb() -> float:
+    """Resident set size of the current process in megabytes"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * _PAGE_SIZE / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # Peak RSS is the closest portable fallback (kilobytes on Linux)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _worker_main(conn, initializer: Optional[Callable], initargs: Tuple) -> None:
+    """Entry point of a render worker process"""
+    # Ctrl+C is delivered to the whole process group; let the parent decide
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if initializer is not None:
+        initializer(*initargs)
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+
+        fn, args, kwargs = task
+        try:
+            message = ("ok", fn(*args, **kwargs))
+        except Exception as e:
+            message = ("error", e)
+
+        try:
+            conn.send(message + (_current_rss_mb(),))
+        except Exception as e:
+            # Result or exception could not be pickled
+            conn.send(("error", RuntimeError(f"{type(e).__name__}: {e}"), _current_rss_mb()))
+    conn.close()
+
+
+class _Worker:
+    """Parent-side handle of one render worker process"""
+
+    def __init__(self, ctx, initializer: Optional[Callable], initargs: Tuple):
+        self._conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, initializer, initargs),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.renders = 0
+        self.rss_mb = 0.0
+        # Timeout of the task the worker was killed for, if it was
+        self.killed_after: Optional[float] = None
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid
+
+    def run(self, fn: Callable, args: Tuple, kwargs: Dict[str, Any]) -> Any:
+        """Run a task in the worker and block until it answers"""
+        try:
+            self._conn.send((fn, args, kwargs))
+            status, value, self.rss_mb = self._conn.recv()
+        except (EOFError, BrokenPipeError, ConnectionResetError) as e:
+            if self.killed_after is not None:
+                raise RenderTimeoutError(self.killed_after, running=True) from e
+            raise WorkerCrashedError(
+                f"Render worker {self.pid} exited with code {self.process.exitcode}"
+            ) from e
+        finally:
+            self.renders += 1
+
+        if status == "error":
+            raise value
+        return value
+
+    def kill(self, timeout: float) -> None:
+        """Kill the worker mid-task; run() then raises RenderTimeoutError"""
+        self.killed_after = timeout
+        self.process.kill()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Ask the worker to exit, terminating it if it does not"""
+        try:
+            self._conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout)
+        self._conn.close()
+
+
+class RenderPool:
+    """
+    Pool of warm worker processes with async task submission
+
+    Args:
+        max_workers: Number of worker processes
+        initializer: Callable run once in each worker at spawn
+        initargs: Arguments for the initializer
+        max_renders_per_worker: Recycle a worker after this many tasks (0 disables)
+        max_rss_mb: Recycle a worker once its RSS exceeds this many MB (0 disables)
+        start_method: multiprocessing start method for the workers
+        lane_max_wait: Longest estimated wait in seconds admitted per lane (0 or absent: no limit)
+        max_queued: Most tasks waiting across all lanes (0 disables)
+        expected_task_seconds: Task duration assumed until some have been measured
+    """
+
+    # Affinity entries remembered; older keys fall back to any idle worker
+    MAX_AFFINITY_KEYS = 4096
+
+    # Weight of the latest task in the moving average of task durations
+    DURATION_SMOOTHING = 0.2
+
+    # Attempts to spawn a replacement worker, and the first delay between them
+    RESPAWN_ATTEMPTS = 5
+    RESPAWN_BACKOFF = 0.5
+
+    def __init__(
+        self,
+        max_workers: int,
+        initializer: Optional[Callable] = None,
+        initargs: Tuple = (),
+        max_renders_per_worker: int = 0,
+        max_rss_mb: int = 0,
+        start_method: str = "spawn",
+        lane_max_wait: Optional[Dict[str, float]] = None,
+        max_queued: int = 0,
+        expected_task_seconds: float = 1.0,
+    ):
+        self.max_workers = max(1, max_workers)
+        self.max_renders_per_worker = max_renders_per_worker
+        self.max_rss_mb = max_rss_mb
+        self.lane_max_wait = lane_max_wait or {}
+        self.max_queued = max_queued
+        self._task_seconds = expected_task_seconds
+        self._initializer = initializer
+        self._initargs = initargs
+        self._ctx = multiprocessing.get_context(start_method)
+        # Threads only wait on worker pipes; one per worker plus room for respawns
+        self._threads = ThreadPoolExecutor(
+            max_workers=self.max_workers * 2,
+            thread_name_prefix="render-pool",
+        )
+        self._workers: List[_Worker] = []
+        self._idle: Deque[_Worker] = deque()
+        self._idle_waiters: Dict[str, Deque[asyncio.Future]] = {lane: deque() for lane in LANES}
+        self._affinity: "OrderedDict[str, _Worker]" = OrderedDict()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._waiting = 0
+        self._affinity_hits = 0
+        self._rejected = {lane: 0 for lane in LANES}
+        self._cancelled = 0
+        self._timed_out = 0
+        self._killed = 0
+        self._completed = 0
+        self._recycled = 0
+        # Slots whose worker is being replaced
+        self._starting = 0
+        self._closed = False
+
+    @property
+    def started(self) -> bool:
+        return self._loop is not None
+
+    def start(self) -> None:
+        """Spawn the worker processes; must be called from the event loop"""
+        if self.started:
+            return
+        self._loop = asyncio.get_running_loop()
+        for _ in range(self.max_workers):
+            worker = self._spawn()
+            self._workers.append(worker)
+            self._put_idle(worker)
+        logger.info(
+            f"Render pool started with {self.max_workers} workers "
+            f"(recycle after {self.max_renders_per_worker} renders or {self.max_rss_mb} MB)"
+        )
+
+    async def submit(
+        self,
+        fn: Callable,
+        *args,
+        affinity: Optional[str] = None,
+        lane: str = INTERACTIVE,
+        timeout: Optional[float] = None,
+        **kwargs
+    ) -> Any:
+        """
+        Run fn(*args, **kwargs) in a worker process
+
+        Args:
+            fn: Picklable module-level callable
+            *args: Positional arguments for fn
+            affinity: Key whose previous worker should run this task if idle
+            lane: Priority lane to wait in when no worker is idle
+            timeout: Seconds the task may wait and run in total; None for no limit
+            **kwargs: Keyword arguments for fn
+
+        Returns:
+            The value returned by fn
+
+        Raises:
+            RenderQueueFullError: If the task is not admitted to the queue
+            RenderTimeoutError: If the task is not done within its timeout
+        """
+        if self._closed:
+            raise RuntimeError("Render pool is shut down")
+        self.start()
+
+        deadline = self._loop.time() + timeout if timeout else None
+        if not self._idle:
+            self._admit(lane)
+        self._waiting += 1
+        try:
+            async with asyncio.timeout_at(deadline):
+                worker = await self._acquire(self._affinity.get(affinity) if affinity else None, lane)
+        except TimeoutError:
+            self._timed_out += 1
+            raise RenderTimeoutError(timeout, running=False) from None
+        except asyncio.CancelledError:
+            # The caller went away, e.g. its client disconnected; the task never ran
+            self._cancelled += 1
+            raise
+        finally:
+            self._waiting -= 1
+
+        if affinity:
+            self._affinity[affinity] = worker
+            self._affinity.move_to_end(affinity)
+            if len(self._affinity) > self.MAX_AFFINITY_KEYS:
+                self._affinity.popitem(last=False)
+
+        return await self._run(worker, fn, args, kwargs, deadline, timeout)
+
+    async def run_on_each(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> List[Any]:
+        """
+        Run fn(*args, **kwargs) once in every live worker process
+
+        Each worker is held as it becomes idle until all of them are, so the
+        task reaches every worker exactly once. A slot whose worker could not
+        be respawned is not waited for.
+
+        Args:
+            fn: Picklable module-level callable
+            *args: Positional arguments for fn
+            timeout: Seconds to wait for the workers and the task in total; None for no limit
+            **kwargs: Keyword arguments for fn
+
+        Returns:
+            The values returned by fn, one per worker
+
+        Raises:
+            RenderTimeoutError: If the workers are not all done within the timeout
+        """
+        if self._closed:
+            raise RuntimeError("Render pool is shut down")
+        self.start()
+
+        workers: List[_Worker] = []
+        running = False
+        self._waiting += 1
+        try:
+            async with asyncio.timeout(timeout):
+                try:
+                    # Slots being respawned count: their new worker is on its way
+                    while len(workers) < len(self._workers):
+                        workers.append(await self._acquire(None))
+                except (asyncio.CancelledError, TimeoutError):
+                    for worker in workers:
+                        self._put_idle(worker)
+                    raise
+                finally:
+                    self._waiting -= 1
+                running = True
+                return await asyncio.gather(*(self._run(worker, fn, args, kwargs) for worker in workers))
+        except TimeoutError:
+            raise RenderTimeoutError(timeout, running) from None
+
+    def _run(
+        self,
+        worker: _Worker,
+        fn: Callable,
+        args: Tuple,
+        kwargs: Dict[str, Any],
+        deadline: Optional[float] = None,
+        timeout: Optional[float] = None
+    ) -> asyncio.Future:
+        """Start a task on an acquired worker, which is released when it finishes"""
+        started = time.perf_counter()
+        future = self._threads.submit(worker.run, fn, args, kwargs)
+        # Scheduled on the loop rather than awaited, so the deadline holds even
+        # when the caller has gone and nobody is waiting for the result
+        expiry = (
+            self._loop.call_at(deadline, self._expire, worker, future, timeout)
+            if deadline is not None else None
+        )
+        # Release from the pipe thread so a cancelled caller never hands back a busy worker
+        future.add_done_callback(
+            lambda _: self._loop.call_soon_threadsafe(self._release, worker, started, expiry)
+        )
+        return asyncio.wrap_future(future)
+
+    def estimated_wait(self, lane: str = INTERACTIVE) -> float:
+        """
+        Seconds a task submitted to a lane now would likely wait for a worker
+
+        Counts the tasks queued in that lane and the lanes above it, which are
+        served first, plus a round of the running tasks when all workers are busy.
+        """
+        if self._idle:
+            return 0.0
+        ahead = 0
+        for name in LANES:
+            ahead += len(self._idle_waiters[name])
+            if name == lane:
+                break
+        return (ahead // self.max_workers + 1) * self._task_seconds
+
+    def _admit(self, lane: str) -> None:
+        """Refuse a task that would wait too long or overfill the queue"""
+        wait = self.estimated_wait(lane)
+        max_wait = self.lane_max_wait.get(lane, 0)
+        if max_wait and wait > max_wait:
+            self._rejected[lane] += 1
+            raise RenderQueueFullError(lane, max(1, math.ceil(wait - max_wait)))
+        if self.max_queued and sum(len(waiters) for waiters in self._idle_waiters.values()) >= self.max_queued:
+            self._rejected[lane] += 1
+            raise RenderQueueFullError(lane, max(1, math.ceil(wait)))
+
+    async def _acquire(self, preferred: Optional[_Worker], lane: str = INTERACTIVE) -> _Worker:
+        """Take an idle worker, the preferred one if it is idle"""
+        if self._idle:
+            if preferred is not None and preferred in self._idle:
+                self._idle.remove(preferred)
+                self._affinity_hits += 1
+                return preferred
+            return self._idle.popleft()
+
+        waiter = self._loop.create_future()
+        self._idle_waiters[lane].append(waiter)
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            # Handed a worker just as we were cancelled: pass it on
+            if waiter.done() and not waiter.cancelled():
+                self._put_idle(waiter.result())
+            elif waiter in self._idle_waiters[lane]:
+                # Leave the queue now so depth and wait estimates stay honest
+                self._idle_waiters[lane].remove(waiter)
+            raise
+
+    def _put_idle(self, worker: _Worker) -> None:
+        for lane in LANES:
+            waiters = self._idle_waiters[lane]
+            while waiters:
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    waiter.set_result(worker)
+                    return
+        self._idle.append(worker)
+
+    def _expire(self, worker: _Worker, future, timeout: float) -> None:
+        if future.done():
+            return
+        logger.warning(
+            f"Killing render worker {worker.pid}: render still running after its {timeout:g}s deadline"
+        )
+        self._killed += 1
+        worker.kill(timeout)
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self._ctx, self._initializer, self._initargs)
+
+    def _should_recycle(self, worker: _Worker) -> bool:
+        # A killed worker may not have been reaped yet, so is_alive() can lag
+        if worker.killed_after is not None or not worker.process.is_alive():
+            return True
+        if self.max_renders_per_worker and worker.renders >= self.max_renders_per_worker:
+            return True
+        return bool(self.max_rss_mb and worker.rss_mb > self.max_rss_mb)
+
+    def _release(self, worker: _Worker, started: float, expiry: Optional[asyncio.TimerHandle] = None) -> None:
+        if expiry is not None:
+            expiry.cancel()
+        self._completed += 1
+        # A killed task ran for its whole timeout, which says nothing about typical renders
+        if worker.killed_after is None:
+            self._task_seconds += self.DURATION_SMOOTHING * (time.perf_counter() - started - self._task_seconds)
+        if self._closed:
+            return
+        if not self._should_recycle(worker):
+            self._put_idle(worker)
+            return
+
+        if worker.killed_after is None:
+            logger.info(
+                f"Recycling render worker {worker.pid} after {worker.renders} renders "
+                f"({worker.rss_mb:.0f} MB RSS)"
+            )
+        self._recycled += 1
+        self._starting += 1
+        future = self._threads.submit(self._replace, worker)
+        future.add_done_callback(lambda f: self._on_replaced(worker, f))
+
+    def _replace(self, worker: _Worker) -> _Worker:
+        worker.stop()
+        delay = self.RESPAWN_BACKOFF
+        for attempt in range(1, self.RESPAWN_ATTEMPTS + 1):
+            try:
+                return self._spawn()
+            except Exception as e:
+                if attempt == self.RESPAWN_ATTEMPTS or self._closed:
+                    raise
+                logger.warning(f"Failed to spawn render worker (attempt {attempt}): {e}; retrying in {delay:g}s")
+                time.sleep(delay)
+                delay *= 2
+
+    def _on_replaced(self, old_worker: _Worker, future) -> None:
+        if self._closed:
+            if future.exception() is None:
+                future.result().stop(timeout=2.0)
+            return
+
+        def put_back():
+            # Drop only this slot's old worker; others may still be mid-replacement
+            self._starting -= 1
+            if old_worker in self._workers:
+                self._workers.remove(old_worker)
+            if future.exception() is not None:
+                logger.error(
+                    f"Failed to respawn render worker: {future.exception()}; "
+                    f"pool down to {len(self._workers)} of {self.max_workers} workers"
+                )
+                return
+            new_worker = future.result()
+            self._workers.append(new_worker)
+            if self._closed:
+                new_worker.stop()
+            else:
+                self._put_idle(new_worker)
+
+        self._loop.call_soon_threadsafe(put_back)
+
+    def worker_pids(self) -> List[int]:
+        """Process IDs of the current workers"""
+        return [worker.pid for worker in self._workers]
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of pool occupancy"""
+        idle = len(self._idle)
+        return {
+            "workers": len(self._workers),
+            "max_workers": self.max_workers,
+            "idle": idle,
+            "busy": len(self._workers) - idle - self._starting if self.started else 0,
+            "starting": self._starting,
+            "waiting": self._waiting,
+            "queued": {lane: len(waiters) for lane, waiters in self._idle_waiters.items()},
+            "rejected": dict(self._rejected),
+            "cancelled": self._cancelled,
+            "timed_out": self._timed_out,
+            "killed": self._killed,
+            "estimated_wait": {lane: round(self.estimated_wait(lane), 3) for lane in LANES},
+            "task_seconds": round(self._task_seconds, 3),
+            "completed": self._completed,
+            "recycled": self._recycled,
+            "affinity_hits": self._affinity_hits,
+        }
+
+    def shutdown(self) -> None:
+        """Stop every worker process"""
+        self._closed = True
+        for worker in self._workers:
+            worker.stop(timeout=2.0)
+        self._workers = []
+        self._threads.shutdown(wait=False, cancel_futures=True)
@@ -1,250 +1,113 @@
 """
-Resume template generator for dynamic PDF creation
+Resume template engine and theme registry.
+
+Resume HTML is rendered from Jinja2 templates compiled once per process. A
+theme pairs a template with a stylesheet; the stylesheet is handed to the
+renderer separately instead of being written into every document, and a hash
+of both is the theme's version, which goes into the cache key.
 """
-from typing import Dict, Any, List
-
-def generate_resume_html(resume_data: Dict[str, Any]) -> str:
-    """Generate HTML from resume data"""
-    
-    basics = resume_data.get('basics', {})
-    summary = resume_data.get('summary', '')
-    work = resume_data.get('work', [])
-    skills = resume_data.get('skills', [])
-    education = resume_data.get('education', [])
-    
-    # Generate skills HTML
-    skills_html = ""
-    for skill_group in skills:
-        name = skill_group.get('name', '')
-        keywords = skill_group.get('keywords', [])
-        if name and keywords:
-            skills_html += f"""
-            <div class="skill-category">
-                <h4>{name}:</h4>
-                <p>{', '.join(keywords)}</p>
-            </div>
-            """
-    
-    # Generate work experience HTML
-    work_html = ""
-    for job in work:
-        highlights_html = ""
-        for highlight in job.get('highlights', []):
-            highlights_html += f"<li>{highlight}</li>"
-        
-        work_html += f"""
-        <div class="job-entry">
-            <div class="job-header">
-                <h3>{job.get('name', '')}</h3>
-                <span class="date">{job.get('startDate', '')} – {job.get('endDate', '')}</span>
-            </div>
-            <p class="job-title">{job.get('position', '')}</p>
-            <ul>{highlights_html}</ul>
-        </div>
-        """
-    
-    # Generate education HTML
-    education_html = ""
-    for edu in education:
-        courses_html = ""
-        for course in edu.get('courses', []):
-            courses_html += f"<li>{course}</li>"
-        
-        education_html += f"""
-        <div class="education-entry">
-            <div class="education-header">
-                <h3>{edu.get('institution', '')}</h3>
-                <span class="date">{edu.get('startDate', '')} – {edu.get('endDate', '')}</span>
-            </div>
-            <p class="job-title">{edu.get('studyType', '')}</p>
-            {f'<ul>{courses_html}</ul>' if courses_html else ''}
-        </div>
-        """
-    
-    # Generate profiles HTML
-    profiles_html = ""
-    for profile in basics.get('profiles', []):
-        profiles_html += f'<a href="{profile.get("url", "")}">{profile.get("network", "")}</a> | '
-    
-    return f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>{basics.get('name', 'Resume')}</title>
-        <style>
-            @page {{
-                size: A4;
-                margin: 0.5in;
-            }}
-            
-            body {{
-                font-family: Arial, sans-serif;
-                font-size: 11px;
-                line-height: 1.4;
-                color: #333;
-                margin: 0;
-                padding: 12px 20px;
-                background: white;
-            }}
-            
-            .resume-container {{
-                max-width: 100%;
-                margin: 0 auto;
-            }}
-            
-            .header {{
-                text-align: center;
-                border-bottom: 2px solid #333;
-                padding-bottom: 10px;
-                margin-bottom: 15px;
-            }}
-            
-            .header h1 {{
-                font-size: 18px;
-                font-weight: bold;
-                margin: 0 0 5px 0;
-                text-transform: uppercase;
-                letter-spacing: 1px;
-            }}
-            
-            .header p {{
-                font-size: 12px;
-                margin: 2px 0;
-                font-weight: normal;
-            }}
-            
-            .contact-info {{
-                font-size: 10px;
-                word-wrap: break-word;
-            }}
-            
-            .contact-info a {{
-                color: #0077b5;
-                text-decoration: none;
-            }}
-            
-            h2 {{
-                font-size: 13px;
-                font-weight: bold;
-                text-transform: uppercase;
-                border-bottom: 1px solid #ccc;
-                padding-bottom: 3px;
-                margin-top: 12px;
-                margin-bottom: 6px;
-            }}
-            
-            .job-entry, .education-entry {{
-                margin-bottom: 6px;
-            }}
-            
-            .job-header, .education-header {{
-                display: flex;
-                justify-content: space-between;
-                align-items: baseline;
-                margin-bottom: 2px;
-            }}
-            
-            .job-header h3, .education-header h3 {{
-                font-size: 13px;
-                font-weight: bold;
-                margin: 0;
-            }}
-            
-            .job-header .date, .education-header .date {{
-                font-size: 10px;
-                color: #666;
-                white-space: nowrap;
-            }}
-            
-            .job-title {{
-                font-size: 10px;
-                font-style: italic;
-                color: #444;
-                margin: 0 0 4px 0;
-            }}
-            
-            ul {{
-                padding-left: 15px;
-                margin: 0;
-            }}
-            
-            li {{
-                margin-bottom: 3px;
-                font-size: 10px;
-            }}
-            
-            .skills-list {{
-                display: flex;
-                flex-wrap: wrap;
-                gap: 8px;
-                font-size: 10px;
-            }}
-            
-            .skill-category {{
-                flex-basis: 48%;
-            }}
-            
-            .skill-category h4 {{
-                font-size: 10px;
-                font-weight: bold;
-                margin: 0 0 2px 0;
-                border: none;
-                padding: 0;
-                text-transform: none;
-            }}
-            
-            .skill-category p {{
-                margin: 0;
-            }}
-            
-            @media print {{
-                body {{
-                    margin: 0;
-                    padding: 0;
-                }}
-                .resume-container {{
-                    margin: 0;
-                    padding: 12px 20px 30px;
-                    border: none;
-                    box-shadow: none;
-                    max-width: 100%;
-                }}
-                .job-entry, .education-entry {{
-                    page-break-inside: avoid;
-                }}
-                h2 {{
-                    page-break-after: avoid;
-                }}
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="resume-container">
-            <div class="header">
-                <h1>{basics.get('name', 'NAME')}</h1>
-                <p>{basics.get('label', 'TITLE')}</p>
-                <div class="contact-info">
-                    {basics.get('location', '')} | {basics.get('phone', '')} | {basics.get('email', '')} | {profiles_html.rstrip(' | ')}
-                </div>
-            </div>
-
-            <h2>PROFESSIONAL SUMMARY</h2>
-            <p style="font-size: 10px; margin: 0 0 5px 0;">
-                {summary}
-            </p>
-
-            <h2>TECHNICAL EXPERTISE</h2>
-            <div class="skills-list">
-                {skills_html}
-            </div>
-
-            <h2>PROFESSIONAL EXPERIENCE</h2>
-            {work_html}
-
-            {f'<h2>EDUCATION</h2>{education_html}' if education_html else ''}
-        </div>
-    </body>
-    </html>
-    """
\ No newline at end of file
+import hashlib
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Tuple
+from jinja2 import Environment, FileSystemLoader, Template, select_autoescape
+
+logger = logging.getLogger("pdf-service")
+
+TEMPLATE_DIR = Path(__file__).resolve().parent.parent / "templates"
+DEFAULT_THEME = "classic"
+
+class Theme(NamedTuple):
+    """A compiled resume template and its stylesheet"""
+    name: str
+    template: Template
+    stylesheet: str
+    version: str
+
+class RenderedResume(NamedTuple):
+    """Resume HTML and the stylesheets to render it with"""
+    html: str
+    stylesheets: Tuple[str, ...]
+    theme: str
+    render_time: float
+
+_environment = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    autoescape=select_autoescape(["html"]),
+    # Templates never change under a running process
+    auto_reload=False,
+    finalize=lambda value: "" if value is None else value,
+)
+
+_themes: Dict[str, Theme] = {}
+
+def register_theme(name: str, template_name: str, stylesheet_name: str) -> Theme:
+    """
+    Compile a theme and add it to the registry
+
+    Args:
+        name: Name requests select the theme by
+        template_name: Template path relative to TEMPLATE_DIR
+        stylesheet_name: Stylesheet path relative to TEMPLATE_DIR
+
+    Returns:
+        The registered theme
+    """
+    source, _, _ = _environment.loader.get_source(_environment, template_name)
+    stylesheet = (TEMPLATE_DIR / stylesheet_name).read_text(encoding="utf-8")
+    digest = hashlib.sha256()
+    for part in (source, stylesheet):
+        digest.update(part.encode())
+        digest.update(b"\0")
+
+    theme = Theme(
+        name=name,
+        template=_environment.get_template(template_name),
+        stylesheet=stylesheet,
+        version=digest.hexdigest()[:16],
+    )
+    _themes[name] = theme
+    logger.debug(f"Registered resume theme {name} (version {theme.version})")
+    return theme
+
+def available_themes() -> List[str]:
+    """Names of the registered themes"""
+    return sorted(_themes)
+
+def get_theme(name: str = DEFAULT_THEME) -> Theme:
+    """
+    Look up a registered theme
+
+    Raises:
+        ValueError: If no theme has that name
+    """
+    try:
+        return _themes[name]
+    except KeyError:
+        raise ValueError(f"Unknown theme {name!r}; available: {', '.join(available_themes())}")
+
+def render_resume(resume_data: Dict[str, Any], theme: str = DEFAULT_THEME) -> RenderedResume:
+    """
+    Render resume data to HTML with a theme
+
+    Args:
+        resume_data: Resume in JSON Resume format
+        theme: Registered theme name
+
+    Returns:
+        RenderedResume with the HTML, its stylesheets and the render time
+    """
+    selected = get_theme(theme)
+    start_time = time.perf_counter()
+    html = selected.template.render(
+        basics=resume_data.get("basics") or {},
+        summary=resume_data.get("summary", ""),
+        work=resume_data.get("work") or [],
+        skills=resume_data.get("skills") or [],
+        education=resume_data.get("education") or [],
+    )
+    return RenderedResume(html, (selected.stylesheet,), selected.name, time.perf_counter() - start_time)
+
+register_theme("classic", "resume.html", "themes/classic.css")
+register_theme("compact", "resume.html", "themes/compact.css")
@@ -0,0 +1,76 @@
+"""
+Wall-clock stack sampler producing folded stacks.
+
+A daemon thread periodically reads the stack of one target thread and counts
+each distinct stack. The result is in the folded format ("a;b;c 12") that
+flamegraph.pl, inferno and speedscope read. It has no dependencies, so
+render workers can import it without pulling in the web stack. The profile
+of the request being handled travels in a context variable, so code deep in
+the render path can add to it without an extra argument.
+"""
+import os
+import sys
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+class RequestProfile:
+    """Folded stacks collected for one request"""
+
+    def __init__(self):
+        self.samples: Counter = Counter()
+
+    def add(self, samples: Dict[str, int]) -> None:
+        self.samples.update(samples)
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+# Profile of the request being handled; inherited by tasks it starts
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+
+def _frame_label(code) -> str:
+    path = os.path.join(*code.co_filename.split(os.sep)[-2:]) if code.co_filename else "?"
+    # Semicolons separate frames in the folded format
+    return f"{code.co_name} ({path}:{code.co_firstlineno})".replace(";", ",")
+
+class StackSampler:
+    """
+    Sample the stack of a thread until stopped
+
+    Args:
+        root: Label prepended to every stack, e.g. the process it came from
+        interval: Seconds between samples
+        thread_id: Thread to sample; the calling thread if None
+    """
+
+    def __init__(self, root: str, interval: float, thread_id: Optional[int] = None):
+        self.root = root
+        self.interval = interval
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                stack.append(self.root)
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self) -> Dict[str, int]:
+        """Stop sampling and return the folded stacks with their sample counts"""
+        self._stop.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join()
+        return dict(self.samples)
@@ -0,0 +1,66 @@
+"""
+Single-flight execution of concurrent identical work.
+
+When several requests miss the cache for the same key at the same time, only
+the first one renders; the others wait on its result. The work is cancelled
+only once every caller waiting on it has gone, so a render nobody wants any
+more gives up its place in the render queue.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+logger = logging.getLogger("pdf-service")
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one execution"""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # Callers still waiting on each execution
+        self._waiters: Dict[asyncio.Task, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run fn once for all concurrent callers of the same key
+
+        Args:
+            key: Identity of the work, normally the cache key
+            fn: Coroutine function producing the result
+
+        Returns:
+            Tuple of (result, shared) where shared is True when this caller
+            waited on another caller's execution
+        """
+        task = self._inflight.get(key)
+        shared = task is not None
+        if shared:
+            logger.debug(f"Joining in-flight render for key: {key}")
+        else:
+            # Run as a task so waiters still get the result if the first caller goes away
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task), shared
+        except asyncio.CancelledError:
+            if self._waiters[task] == 1 and not task.done():
+                logger.debug(f"Cancelling render for key {key}: no callers left")
+                # Later callers start afresh instead of joining the cancelled work
+                self._forget(key, task)
+                task.cancel()
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
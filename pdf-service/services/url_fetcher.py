@@ -0,0 +1,177 @@
+"""
+Sandboxed resource resolution for rendering.
+
+Documents are rendered from strings, with relative URLs resolved against
+the local asset directory (PDF_ASSET_DIR). The fetcher only serves data:
+URLs and files inside that directory, so a submitted document cannot read
+arbitrary files from the host or make the renderer call out to the network.
+
+Fetched resources are kept in a per-worker cache, so a logo, font or
+stylesheet shared by many renders is read and decoded once. Each fetch is
+bounded in size and read time.
+"""
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+from weasyprint.urls import URLFetcher, URLFetcherResponse
+from config import settings
+
+logger = logging.getLogger("pdf-service")
+
+_READ_CHUNK = 64 * 1024
+
+class AssetCache:
+    """
+    Content-addressed LRU cache of fetched resources, bounded in bytes
+
+    Entries map a resource's identity to the digest of its content, and each
+    distinct content is stored once, so the same image under two names or
+    as both a file and a data: URL takes its size only once.
+
+    Args:
+        max_bytes: Total size of stored content; 0 disables the cache
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        # identity -> (digest, content type), least recently used first
+        self._entries: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()
+        # digest -> (content, entries referring to it)
+        self._blobs: Dict[str, Tuple[bytes, int]] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        """Content and content type of a resource, or None on a miss"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        digest, content_type = entry
+        return self._blobs[digest][0], content_type
+
+    def put(self, key: str, content_type: str, body: bytes) -> None:
+        """Store a resource, evicting the least recently used ones to fit"""
+        if len(body) > self.max_bytes or key in self._entries:
+            return
+        digest = hashlib.sha256(body).hexdigest()
+        stored, references = self._blobs.get(digest, (body, 0))
+        if not references:
+            self.bytes += len(body)
+        self._blobs[digest] = (stored, references + 1)
+        self._entries[key] = (digest, content_type)
+        while self.bytes > self.max_bytes:
+            self._evict()
+
+    def _evict(self) -> None:
+        _, (digest, _) = self._entries.popitem(last=False)
+        body, references = self._blobs[digest]
+        if references > 1:
+            self._blobs[digest] = (body, references - 1)
+        else:
+            del self._blobs[digest]
+            self.bytes -= len(body)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "blobs": len(self._blobs),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+class SandboxedURLFetcher(URLFetcher):
+    """
+    URL fetcher confined to data: URLs and an asset directory
+
+    Args:
+        asset_dir: Directory local files may be read from
+        cache_max_bytes: Size of the resource cache; 0 disables it
+        max_bytes: Largest resource a single fetch may return (0: no limit)
+        fetch_timeout: Longest a single fetch may take to read, in seconds (0: no limit)
+    """
+
+    def __init__(
+        self,
+        asset_dir: str,
+        cache_max_bytes: int = 0,
+        max_bytes: int = 0,
+        fetch_timeout: float = 0,
+        **kwargs
+    ):
+        super().__init__(allowed_protocols={"data", "file"}, allow_redirects=False, **kwargs)
+        self.asset_dir = Path(asset_dir).resolve()
+        self.cache = AssetCache(cache_max_bytes)
+        self.max_bytes = max_bytes
+        self.fetch_timeout = fetch_timeout
+
+    def _resolve(self, url: str) -> Path:
+        path = Path(unquote(urlsplit(url).path)).resolve()
+        if not path.is_relative_to(self.asset_dir):
+            raise ValueError(f"Resource outside the asset directory: {url}")
+        if not path.is_file():
+            raise ValueError(f"Asset not found: {url}")
+        return path
+
+    def _read(self, response, url: str) -> bytes:
+        """Read a response body, enforcing the size and time limits"""
+        deadline = time.monotonic() + self.fetch_timeout if self.fetch_timeout else None
+        chunks = []
+        size = 0
+        while chunk := response.read(_READ_CHUNK):
+            size += len(chunk)
+            if self.max_bytes and size > self.max_bytes:
+                raise ValueError(f"Resource larger than {self.max_bytes} bytes: {url[:100]}")
+            if deadline is not None and time.monotonic() > deadline:
+                raise ValueError(f"Resource took longer than {self.fetch_timeout:g}s to read: {url[:100]}")
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    def fetch(self, url, headers=None):
+        if url.lower().startswith("file:"):
+            # Open the checked, symlink-free path rather than the URL as given
+            path = self._resolve(url)
+            stat = path.stat()
+            if self.max_bytes and stat.st_size > self.max_bytes:
+                raise ValueError(f"Resource larger than {self.max_bytes} bytes: {url}")
+            url = path.as_uri()
+            # A changed file gets a new key, so edits to assets are picked up
+            key = f"{url}|{stat.st_size}|{stat.st_mtime_ns}"
+        else:
+            # data: URLs can be large; key on their digest rather than keep them
+            key = "url:" + hashlib.sha256(url.encode()).hexdigest()
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            body, content_type = cached
+            return URLFetcherResponse(url, body, {"Content-Type": content_type})
+
+        response = super().fetch(url, headers)
+        try:
+            body = self._read(response, url)
+        finally:
+            response.close()
+        content_type = response.headers.get("Content-Type", "application/octet-stream")
+        self.cache.put(key, content_type, body)
+        return URLFetcherResponse(response.url, body, {"Content-Type": content_type})
+
+def base_url() -> str:
+    """Base URL relative references in documents resolve against"""
+    return Path(settings.pdf_asset_dir).resolve().as_uri() + "/"
+
+def create_url_fetcher() -> SandboxedURLFetcher:
+    """Build the fetcher a render worker uses for every document"""
+    return SandboxedURLFetcher(
+        settings.pdf_asset_dir,
+        cache_max_bytes=settings.pdf_asset_cache_max_mb * 1024 * 1024,
+        max_bytes=settings.pdf_asset_max_mb * 1024 * 1024,
+        fetch_timeout=settings.pdf_asset_fetch_timeout,
+    )
@@ -0,0 +1,233 @@
+"""
+Cache warm-up from a manifest of published documents.
+
+After a deploy or a Redis restart the cache is cold, and the first visitor to
+each resume would pay for a full render. At startup the service reads a
+manifest, a JSON file and/or a Redis set of request payloads, and renders in
+the background whatever the cache is missing. Readiness stays false until
+WARMUP_READY_FRACTION of the entries are warm, retrying failed entries with
+backoff, or until WARMUP_READY_TIMEOUT gives up waiting. The pass can repeat
+on an interval so entries are re-rendered as they expire.
+"""
+import asyncio
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from pydantic import TypeAdapter, ValidationError
+from config import settings
+from services import redis_client
+from services.cache import get_cached_pdfs
+from services.documents import DocumentRequest, document_cache_key, render_once
+from services.pdf_generator import BATCH, render_lane
+
+logger = logging.getLogger("pdf-service")
+
+_request_adapter = TypeAdapter(DocumentRequest)
+
+# Backoff between passes retrying entries that failed, while short of ready
+_RETRY_DELAY = 5.0
+_MAX_RETRY_DELAY = 60.0
+
+class WarmupProgress:
+    """Progress of the current warm-up pass"""
+
+    def __init__(self):
+        self.state = "pending"
+        self.passes = 0
+        self.total = 0
+        self.cached = 0
+        self.rendered = 0
+        self.failed = 0
+        self.invalid = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # Set by the first pass that reaches the threshold, never cleared
+        self._ready = asyncio.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def mark_ready(self) -> None:
+        self._ready.set()
+
+    async def wait_ready(self) -> None:
+        await self._ready.wait()
+
+    @property
+    def warm(self) -> int:
+        return self.cached + self.rendered
+
+    @property
+    def fraction(self) -> float:
+        return self.warm / self.total if self.total else 1.0
+
+    def check_ready(self) -> None:
+        if not self.ready and self.fraction >= settings.warmup_ready_fraction:
+            self.mark_ready()
+            elapsed = time.time() - (self.started_at or time.time())
+            logger.info(f"Cache warm-up reached {self.fraction:.0%} after {elapsed:.1f}s; ready")
+
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        return {
+            "state": self.state,
+            "ready": self.ready,
+            "passes": self.passes,
+            "total": self.total,
+            "warm": self.warm,
+            "already_cached": self.cached,
+            "rendered": self.rendered,
+            "failed": self.failed,
+            "invalid": self.invalid,
+            "fraction": round(self.fraction, 3),
+            "elapsed": round(end - self.started_at, 2) if self.started_at else 0.0,
+        }
+
+progress = WarmupProgress()
+
+def _parse_entries(raw_entries: List[Any], source: str) -> List[DocumentRequest]:
+    entries = []
+    for raw in raw_entries:
+        try:
+            if isinstance(raw, (str, bytes)):
+                entries.append(_request_adapter.validate_json(raw))
+            else:
+                entries.append(_request_adapter.validate_python(raw))
+        except (ValidationError, ValueError) as e:
+            progress.invalid += 1
+            logger.warning(f"Skipping invalid warm-up entry from {source}: {str(e)[:200]}")
+    return entries
+
+async def load_manifest() -> List[DocumentRequest]:
+    """
+    Read warm-up entries from the manifest file and Redis set
+
+    Either source may be absent or unavailable; entries that fail validation
+    are skipped and counted as invalid.
+
+    Returns:
+        Validated PDF and resume requests, de-duplicated by cache key
+    """
+    entries: List[DocumentRequest] = []
+
+    if settings.warmup_manifest_path:
+        path = Path(settings.warmup_manifest_path)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            raw = data.get("items", []) if isinstance(data, dict) else data
+            entries.extend(_parse_entries(raw, str(path)))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unable to read warm-up manifest {path}: {str(e)}")
+
+    if settings.warmup_redis_set:
+        try:
+            members = await redis_client.execute(lambda r: r.smembers(settings.warmup_redis_set))
+            entries.extend(_parse_entries(list(members), settings.warmup_redis_set))
+        except Exception as e:
+            logger.warning(f"Unable to read warm-up set {settings.warmup_redis_set}: {str(e)}")
+
+    unique: Dict[str, DocumentRequest] = {}
+    for entry in entries:
+        unique.setdefault(document_cache_key(entry), entry)
+    return list(unique.values())
+
+async def warm_cache() -> Dict[str, Any]:
+    """
+    Run one warm-up pass: render every manifest entry missing from the cache
+
+    Returns:
+        Progress of the pass
+    """
+    progress.state = "running"
+    progress.passes += 1
+    progress.cached = progress.rendered = progress.failed = progress.invalid = 0
+    progress.started_at, progress.finished_at = time.time(), None
+
+    entries = await load_manifest()
+    keys = [document_cache_key(entry) for entry in entries]
+    progress.total = len(entries)
+
+    cached = await get_cached_pdfs(keys)
+    progress.cached = len(cached)
+    progress.check_ready()
+    logger.info(f"Cache warm-up: {len(entries)} entries, {len(cached)} already cached")
+
+    semaphore = asyncio.Semaphore(max(1, settings.warmup_concurrency))
+
+    async def warm(entry: DocumentRequest, key: str) -> None:
+        async with semaphore:
+            try:
+                await render_once(entry, key)
+                progress.rendered += 1
+            except Exception as e:
+                progress.failed += 1
+                logger.warning(f"Warm-up render for key {key} failed: {str(e)}")
+            progress.check_ready()
+
+    await asyncio.gather(*(
+        warm(entry, key) for entry, key in zip(entries, keys) if key not in cached
+    ))
+
+    progress.state = "done"
+    progress.finished_at = time.time()
+    logger.info(
+        f"Cache warm-up pass {progress.passes} finished in {progress.finished_at - progress.started_at:.1f}s: "
+        f"{progress.rendered} rendered, {progress.failed} failed"
+    )
+    return progress.to_dict()
+
+def _ready_timeout() -> None:
+    if progress.ready:
+        return
+    logger.warning(
+        f"Cache warm-up still at {progress.fraction:.0%} of {progress.total} entries after "
+        f"{settings.warmup_ready_timeout:g}s, short of {settings.warmup_ready_fraction:.0%}; ready anyway"
+    )
+    progress.mark_ready()
+
+async def run_warmup() -> None:
+    """
+    Warm the cache at startup and then every WARMUP_INTERVAL seconds, if set
+
+    Until the ready fraction is warm, passes repeat with backoff so failed
+    entries are retried, unless WARMUP_READY_TIMEOUT passes first.
+    """
+    render_lane.set(BATCH)
+    timer = None
+    if settings.warmup_ready_timeout > 0:
+        timer = asyncio.get_running_loop().call_later(settings.warmup_ready_timeout, _ready_timeout)
+    retry_delay = _RETRY_DELAY
+    try:
+        while True:
+            try:
+                await warm_cache()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"Cache warm-up failed: {str(e)}")
+                progress.state = "failed"
+            if not progress.ready:
+                logger.info(
+                    f"Cache warm-up at {progress.fraction:.0%}, short of "
+                    f"{settings.warmup_ready_fraction:.0%}; retrying in {retry_delay:g}s"
+                )
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, _MAX_RETRY_DELAY)
+                continue
+            if settings.warmup_interval <= 0:
+                return
+            await asyncio.sleep(settings.warmup_interval)
+    finally:
+        if timer is not None:
+            timer.cancel()
+
+def start_warmup() -> Optional[asyncio.Task]:
+    """Start warm-up in the background, or mark ready when there is no manifest"""
+    if not settings.warmup_manifest_path and not settings.warmup_redis_set:
+        progress.state = "disabled"
+        progress.mark_ready()
+        return None
+    return asyncio.create_task(run_warmup())
@@ -0,0 +1,38 @@
+"""Page range validation on the PDF endpoints."""
+import pytest
+from fastapi.testclient import TestClient
+import main
+from services import documents
+
+RESUME = {"basics": {"name": "Sample Person"}, "work": [], "skills": [], "education": []}
+
+@pytest.fixture
+def client(monkeypatch):
+    async def cache_miss(cache_key):
+        return None
+
+    async def one_page_render(html_content, pages=None, **options):
+        # What the render worker raises for a range past the end of the document
+        raise ValueError(f"Pages {pages} not in document of 1 pages")
+
+    monkeypatch.setattr(main, "get_cached_entry", cache_miss)
+    monkeypatch.setattr(documents, "render_pdf_from_html", one_page_render)
+    return TestClient(main.app, base_url="http://localhost")
+
+@pytest.mark.parametrize("pages", ["0", "3-1", "1,0-2", "a-b"])
+@pytest.mark.parametrize("endpoint, body", [
+    ("/api/pdf", {"html": "<p>Hello, world</p>"}),
+    ("/api/resume-pdf", {"resume_data": RESUME}),
+])
+def test_malformed_pages_rejected_before_rendering(client, endpoint, body, pages):
+    response = client.post(endpoint, json={**body, "pages": pages})
+    assert response.status_code == 422
+
+@pytest.mark.parametrize("endpoint, body", [
+    ("/api/pdf", {"html": "<p>Hello, world</p>"}),
+    ("/api/resume-pdf", {"resume_data": RESUME}),
+])
+def test_pages_past_the_end_are_a_client_error(client, endpoint, body):
+    response = client.post(endpoint, json={**body, "pages": "9"})
+    assert response.status_code == 400
+    assert "not in document" in response.json()["detail"]
@@ -4,5 +4,13 @@ Utility functions for the PDF service.
 """
 
 from .security import sanitize_html, validate_filename
+from .http import make_etag, etag_matches, not_modified_response, pdf_response
 
-__all__ = ["sanitize_html", "validate_filename"]
+__all__ = [
+    "sanitize_html",
+    "validate_filename",
+    "make_etag",
+    "etag_matches",
+    "not_modified_response",
+    "pdf_response",
+]
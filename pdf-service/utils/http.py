@@ -0,0 +1,224 @@
+import asyncio
+import logging
+import re
+from typing import AsyncIterator, Dict, Optional, Tuple
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+from config import settings
+
+logger = logging.getLogger("pdf-service")
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+def make_etag(cache_key: str) -> str:
+    """
+    Build a strong ETag from a cache key
+
+    Args:
+        cache_key: Key built by services.cache_keys
+
+    Returns:
+        Quoted entity tag
+    """
+    return f'"{cache_key.rsplit(":", 1)[-1][:40]}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Check whether the request's If-None-Match header matches an ETag
+
+    Uses the weak comparison RFC 9110 prescribes for If-None-Match.
+
+    Args:
+        request: Incoming request
+        etag: Current entity tag of the resource
+
+    Returns:
+        True if the client already holds this representation
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in header.split(",")
+    )
+
+def _base_headers(request_id: str, etag: str) -> Dict[str, str]:
+    return {
+        "X-Request-ID": request_id,
+        "ETag": etag,
+        "Cache-Control": settings.pdf_cache_control,
+    }
+
+def not_modified_response(request_id: str, etag: str) -> Response:
+    """Build a 304 response for a client that already holds the PDF"""
+    return Response(status_code=304, headers=_base_headers(request_id, etag))
+
+def parse_range(request: Request, etag: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Resolve the request's Range header against a body of the given size
+
+    Only single byte ranges are honoured; anything else, or an If-Range that
+    no longer matches, falls back to the full body as RFC 9110 allows.
+
+    Args:
+        request: Incoming request
+        etag: Current entity tag of the resource
+        size: Length of the full body
+
+    Returns:
+        Inclusive (start, end) offsets, or None to send the full body
+
+    Raises:
+        ValueError: If the range is well-formed but cannot be satisfied
+    """
+    header = request.headers.get("range")
+    if not header:
+        return None
+    if_range = request.headers.get("if-range")
+    if if_range and if_range.strip() != etag:
+        return None
+
+    match = _RANGE_RE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(f"Range {header} not satisfiable for {size} bytes")
+    return start, end
+
+async def _iter_chunks(view: memoryview, chunk_size: int) -> AsyncIterator[memoryview]:
+    # An async iterator keeps Starlette from hopping to a thread per chunk
+    for offset in range(0, len(view), chunk_size):
+        yield view[offset:offset + chunk_size]
+
+def pdf_response(
+    request: Request,
+    pdf_bytes: bytes,
+    filename: str,
+    request_id: str,
+    etag: str,
+    cache_status: str,
+    extra_headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    Build the response carrying a generated PDF
+
+    The body is streamed as fixed-size memoryview slices of the buffer, so
+    it is never copied while being sent. Single-range requests get a 206.
+
+    Args:
+        request: Incoming request, consulted for Range/If-Range
+        pdf_bytes: PDF content
+        filename: Attachment filename
+        request_id: ID echoed in X-Request-ID
+        etag: Entity tag of the PDF
+        cache_status: HIT, MISS or COALESCED
+        extra_headers: Additional headers to send
+
+    Returns:
+        StreamingResponse with validators and caching headers, or a 416
+        response for an unsatisfiable range
+    """
+    size = len(pdf_bytes)
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Accept-Ranges": "bytes",
+        "X-Cache": cache_status,
+        **_base_headers(request_id, etag),
+        **(extra_headers or {}),
+    }
+
+    try:
+        byte_range = parse_range(request, etag, size)
+    except ValueError:
+        return Response(
+            status_code=416,
+            headers={**_base_headers(request_id, etag), "Content-Range": f"bytes */{size}"}
+        )
+
+    view = memoryview(pdf_bytes)
+    status_code = 200
+    if byte_range is not None:
+        start, end = byte_range
+        view = view[start:end + 1]
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(len(view))
+
+    return StreamingResponse(
+        content=_iter_chunks(view, settings.pdf_stream_chunk_size),
+        status_code=status_code,
+        media_type="application/pdf",
+        headers=headers
+    )
+
+class CancelOnDisconnectMiddleware:
+    """
+    ASGI middleware cancelling a POST under /api/ whose client disconnects
+
+    Starlette keeps running a handler after its client has gone. Once the
+    request body has been read, this listens for the disconnect and, if no
+    response has started, cancels the handler, which drops its render from
+    the queue. Streamed responses that have started notice the disconnect
+    themselves.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+
+        disconnected = asyncio.Event()
+        response_started = False
+        watcher: Optional[asyncio.Task] = None
+
+        async def watch() -> None:
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
+            if not response_started:
+                handler.cancel()
+
+        async def watched_receive():
+            nonlocal watcher
+            if watcher is not None:
+                # The watcher owns the connection now; report what it sees
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request" and not message.get("more_body", False):
+                watcher = asyncio.ensure_future(watch())
+            return message
+
+        async def tracked_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        handler = asyncio.ensure_future(self.app(scope, watched_receive, tracked_send))
+        try:
+            await handler
+        except asyncio.CancelledError:
+            # Cancelled ourselves, e.g. at shutdown, rather than by the watcher
+            if asyncio.current_task().cancelling() or not disconnected.is_set():
+                raise
+            logger.info(f"Client disconnected before the response to {scope['path']}; request cancelled")
+        finally:
+            if watcher is not None:
+                watcher.cancel()
@@ -0,0 +1,58 @@
+"""
+Standalone render job worker.
+
+Consumes the Redis job queue shared with the API, so rendering capacity can
+be scaled independently of the HTTP processes:
+
+    python worker.py --concurrency 4
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+from config import settings
+from services.jobs import get_job_backend, run_job_worker
+from services.pdf_generator import shutdown_render_pool
+from services.redis_client import close_redis_connection
+
+# Configure logging
+log_level = os.getenv("LOG_LEVEL", "INFO").upper()
+logging.basicConfig(
+    level=getattr(logging, log_level, logging.INFO),
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger("pdf-service")
+
+async def main(concurrency: int) -> None:
+    if settings.job_backend != "redis":
+        raise SystemExit("worker.py needs JOB_BACKEND=redis to share jobs with the API")
+
+    backend = get_job_backend()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    logger.info(f"Starting render job worker with {concurrency} consumers")
+    tasks = [asyncio.create_task(run_job_worker(backend)) for _ in range(concurrency)]
+    await stop.wait()
+
+    logger.info("Shutting down render job worker...")
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await backend.close()
+    await close_redis_connection()
+    shutdown_render_pool()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consume queued PDF render jobs")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.render_workers,
+        help="Jobs rendered at once (default: RENDER_WORKERS)"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency))